@@ -8,6 +8,9 @@ from tkinter import simpledialog, messagebox
 import threading
 
 from utils import ScrollableFrame, FFT
+from engine import ADSR, adsr_envelope, render_additive
+from render_cache import get_cache
+from resampler import device_sample_rate, resample
 from preset_manager import PresetManager
 from tooltips import Tooltip
 
@@ -22,10 +25,10 @@ class AdditiveSynth:
         # Initialize variables
         self.update_timer = None
         self.adsr_sliders = {}
-        self.create_ui()
 
         # Track preset name
         self.loaded_preset_name = None
+        self.create_ui()
 
     def create_ui(self):
         """Initialize the UI."""
@@ -163,6 +166,7 @@ class AdditiveSynth:
             "volume": self.volume_slider.get(),
             "tone": self.tone_slider.get(),
             "num_harmonics": int(self.harmonics_slider.get()),
+            "rolloff": self.rolloff_slider.get(),
             "adsr": {
                 "attack": self.adsr_sliders["attack"].get(),
                 "decay": self.adsr_sliders["decay"].get(),
@@ -225,91 +229,15 @@ class AdditiveSynth:
         """
         Generate the additive waveform using IFFT and adjust for duration.
         """
-        # Get the number of harmonics
-        num_harmonics = int(self.harmonics_slider.get())
-
-        # Get the base frequency from the entry box
-        base_freq = float(self.base_freq_entry.get())
-
-        # Create the frequency domain representation
-        freqs = np.arange(1, num_harmonics + 1) * base_freq
-        amplitudes = 1 / (np.arange(1, num_harmonics + 1)) ** self.rolloff_slider.get()
-
-        # Apply tone control (balance odd and even harmonics)
-        tone_value = self.tone_slider.get()
-
-        # Enhanced tone control: Apply a nonlinear scaling factor
-        if tone_value < 0.5:
-            # Reduce even harmonics more aggressively
-            even_reduction = 1 - (tone_value * 2)  # Scale from 1 to 0 as tone_value goes from 0 to 0.5
-            amplitudes[::2] *= even_reduction ** 2  # Square the reduction for a more pronounced effect
-        else:
-            # Reduce odd harmonics more aggressively
-            odd_reduction = (tone_value - 0.5) * 2  # Scale from 0 to 1 as tone_value goes from 0.5 to 1
-            amplitudes[1::2] *= odd_reduction ** 2  # Square the reduction for a more pronounced effect
-
-        # Create the frequency domain array
-        N = int(self.sample_rate * self.duration)  # Use the default duration for FFT
-        freq_domain = np.zeros(N // 2 + 1, dtype=complex)
-
-        # Place the harmonics in the frequency domain
-        for freq, amp in zip(freqs, amplitudes):
-            bin_index = int(freq * N / self.sample_rate)
-            if bin_index < len(freq_domain):
-                freq_domain[bin_index] = amp
-
-        # Perform the IFFT to generate the time-domain waveform
-        waveform = FFT.irfft(freq_domain)
-
-        # Normalize the waveform
-        waveform /= np.max(np.abs(waveform))
-
-        # Apply volume
-        waveform *= self.volume_slider.get()
-
-        # Adjust the waveform to match the desired duration
-        desired_samples = int(self.sample_rate * float(self.duration_entry.get()))
-        if len(waveform) < desired_samples:
-            # Repeat the waveform if it's shorter than the desired duration
-            waveform = np.tile(waveform, int(np.ceil(desired_samples / len(waveform))))
-        waveform = waveform[:desired_samples]  # Truncate to the desired duration
-
-        # Generate the ADSR envelope for the entire desired duration
-        adsr_env = self.generate_adsr_envelope(len(waveform))
-
-        # Apply the ADSR envelope to the waveform
-        waveform *= adsr_env
-
-        return waveform
+        # The IFFT frame stays at the default duration and is repeated to fill the entry's duration
+        return render_additive(self.get_preset_data(self.loaded_preset_name), frame_duration=self.duration)
 
     def generate_adsr_envelope(self, num_samples: int) -> np.ndarray:
         """
         Generate an ADSR envelope based on sliders for the entire duration.
         """
-        attack_samples = int(self.adsr_sliders["attack"].get() * self.sample_rate)
-        decay_samples = int(self.adsr_sliders["decay"].get() * self.sample_rate)
-        sustain_samples = num_samples - attack_samples - decay_samples - int(
-            self.adsr_sliders["release"].get() * self.sample_rate
-        )
-        sustain_level = self.adsr_sliders["sustain"].get()
-
-        if sustain_samples < 0:
-            # If the total ADSR time exceeds the duration, scale the times
-            total_adsr_time = attack_samples + decay_samples + int(
-                self.adsr_sliders["release"].get() * self.sample_rate
-            )
-            scale_factor = num_samples / total_adsr_time
-            attack_samples = int(attack_samples * scale_factor)
-            decay_samples = int(decay_samples * scale_factor)
-            sustain_samples = 0
-
-        envelope = np.concatenate([
-            np.linspace(0, 1, attack_samples),  # Attack
-            np.linspace(1, sustain_level, decay_samples),  # Decay
-            np.full(sustain_samples, sustain_level),  # Sustain
-            np.linspace(sustain_level, 0, num_samples - attack_samples - decay_samples - sustain_samples)  # Release
-        ])
-        return envelope
+        adsr = ADSR(**{param: slider.get() for param, slider in self.adsr_sliders.items()})
+        return adsr_envelope(adsr, num_samples, self.sample_rate)
 
     def load_preset(self, preset_data):
         """Load a preset and update the UI."""
@@ -331,6 +259,7 @@ class AdditiveSynth:
         self.tone_slider.set(preset_data["tone"])
         self.harmonics_slider.set(preset_data["num_harmonics"])
         self.harmonics_value_label.configure(text=str(int(preset_data["num_harmonics"])))
+        self.rolloff_slider.set(preset_data.get("rolloff", 1.0))
 
         # Update ADSR sliders
         self.adsr_sliders["attack"].set(preset_data["adsr"]["attack"])
@@ -342,6 +271,13 @@ class AdditiveSynth:
         self.update_graphs()
 
     def play_sound(self):
-        """Generate the waveform and play it using SoundDevice."""
-        waveform = self.generate_waveform()
-        threading.Thread(target=lambda: sd.play(waveform, samplerate=self.sample_rate),daemon=True).start()
\ No newline at end of file
+        """Generate the waveform and play it using SoundDevice, at the output device's native rate."""
+        # Read the widgets here; the render (or cache lookup) runs on the worker thread
+        preset_data = self.get_preset_data(self.loaded_preset_name)
+
+        def play():
+            waveform = get_cache().render(preset_data, self.sample_rate)
+            device_rate = device_sample_rate(self.sample_rate)
+            sd.play(resample(waveform, self.sample_rate, device_rate), samplerate=device_rate)
+
+        threading.Thread(target=play, daemon=True).start()
\ No newline at end of file
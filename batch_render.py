@@ -0,0 +1,155 @@
+"""
+Render presets from the database to WAV files, one process per core.
+
+    python batch_render.py --output renders [--user UID] [--duration 2] [--output-rate 48000] [names ...]
+
+Presets are loaded through PresetStore and rendered through the engine, so
+no UI is involved. Each worker process renders whole presets with a
+single render thread, leaving the cores to the process pool, at the
+precision of the process that started the pool.
+
+Spawned workers re-import the __main__ module of the process that starts
+them, so the GUI doesn't run the pool itself: start_batch_render() runs
+this module as a separate process, and the workers never load Tk.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import parallel
+import precision
+from render_cache import get_cache
+from preset_store import PresetStore
+from wav_export import SAMPLE_FORMATS, export_wav
+
+
+def wav_path(output_dir, preset_data):
+    """
+    Get the output path for a preset, keeping the name filesystem-safe.
+
+    Presets loaded from the store carry their owner's Uid, which goes in the
+    file name so presets of different users with the same name don't
+    overwrite each other.
+    """
+    name = re.sub(r"[^\w\-. ]", "_", preset_data.get("name") or "untitled")
+    owner = f" (user {preset_data['Uid']})" if preset_data.get("Uid") is not None else ""
+    return os.path.join(output_dir, f"{preset_data['type']} - {name}{owner}.wav")
+
+
+def init_worker(precision_name):
+    """Set up a pool worker: a single render thread, at the parent's sample precision."""
+    parallel.set_workers(1)
+    precision.set_precision(precision_name)
+
+
+def render_to_wav(preset_data, path, sample_rate=None, duration=None, sample_format="float32", output_rate=None):
+    """
+    Stream one preset to a WAV file, reading it from the render cache when it's there.
+
+    Returns:
+        tuple: (render_time, audio_length), both in seconds.
+    """
+    return export_wav(preset_data, path, sample_rate, duration, sample_format, cache=get_cache(), output_rate=output_rate)
+
+
+def batch_render(presets, output_dir, sample_rate=None, duration=None, jobs=None, progress=print, sample_format="float32",
+                 output_rate=None):
+    """
+    Render presets to WAV files across a process pool.
+
+    Args:
+        presets (list): Preset dicts, as returned by PresetStore.load_presets().
+        output_dir (str): Directory for the WAV files; created if needed.
+        sample_rate (int): Override the sample rate of every preset.
+        duration (float): Override the duration of every preset.
+        jobs (int): Worker processes, defaulting to the number of CPUs.
+        progress (callable): Called with a line of text after each preset.
+        sample_format (str): WAV sample format, one of SAMPLE_FORMATS.
+        output_rate (int): Convert every file to this sample rate.
+
+    Returns:
+        dict: Render time in seconds for each written path. Presets that
+            failed are reported through progress and left out.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    timings = {}
+    start = time.perf_counter()
+
+    # Spawned workers don't inherit the parent's threads (or its Tk state)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(jobs, mp_context=context, initializer=init_worker, initargs=(precision.get_precision(),)) as executor:
+        futures = {
+            executor.submit(
+                render_to_wav, preset_data, wav_path(output_dir, preset_data), sample_rate, duration, sample_format, output_rate
+            ): preset_data
+            for preset_data in presets
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            preset_data = futures[future]
+            label = f"[{done}/{len(futures)}] {preset_data.get('name')} ({preset_data['type']})"
+            try:
+                elapsed, length = future.result()
+            except Exception as e:
+                progress(f"{label} failed: {e}")
+                continue
+            timings[wav_path(output_dir, preset_data)] = elapsed
+            progress(f"{label} rendered {length:.2f} s of audio in {elapsed:.3f} s")
+
+    total = time.perf_counter() - start
+    progress(f"Rendered {len(timings)} of {len(presets)} presets in {total:.2f} s with {jobs} processes")
+    return timings
+
+
+def start_batch_render(output_dir, db_path="synth.db", Uid=None, sample_rate=None, sample_format="float32"):
+    """
+    Render presets from the database to WAV files in a new process, without waiting for it.
+
+    The process renders at the current sample precision and reports its
+    progress on the inherited standard output.
+
+    Returns:
+        subprocess.Popen: The batch render process.
+    """
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--db", db_path, "--output", output_dir, "--format", sample_format, "--precision", precision.get_precision(),
+    ]
+    if Uid is not None:
+        command += ["--user", str(Uid)]
+    if sample_rate:
+        command += ["--sample-rate", str(int(sample_rate))]
+    return subprocess.Popen(command)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render presets from the database to WAV files.")
+    parser.add_argument("names", nargs="*", help="Presets to render (default: all)")
+    parser.add_argument("--db", default="synth.db", help="Preset database")
+    parser.add_argument("--user", type=int, help="Only render this user's presets")
+    parser.add_argument("--output", default="renders", help="Output directory")
+    parser.add_argument("--sample-rate", type=int, help="Override the sample rate")
+    parser.add_argument("--duration", type=float, help="Override the duration in seconds")
+    parser.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--format", choices=list(SAMPLE_FORMATS), default="float32", help="WAV sample format")
+    parser.add_argument("--output-rate", type=int, help="Convert the files to this sample rate")
+    parser.add_argument("--precision", choices=precision.PRECISIONS, help="Render precision (default: float32)")
+    args = parser.parse_args()
+    if args.precision:
+        precision.set_precision(args.precision)
+
+    presets = PresetStore(args.db, args.user).load_presets(args.names or None)
+    if not presets:
+        print("No presets to render.")
+        return
+    batch_render(presets, args.output, args.sample_rate, args.duration, args.jobs, sample_format=args.format,
+                 output_rate=args.output_rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+from collections import defaultdict
+
+
+class BufferArena:
+    """
+    Reusable scratch buffers for the render pipeline.
+
+    Buffers are pooled by (size, dtype). Use the arena as a context manager
+    around one render: every buffer taken inside the block goes back to the
+    pool when it exits, ready for the next render of the same length. Buffers
+    that a render didn't use are dropped at that point, so changing the
+    duration doesn't leave stale sizes behind.
+
+    Anything returned to a caller must not come from the arena, because the
+    next render will overwrite it.
+    """
+
+    def __init__(self):
+        self.free = defaultdict(list)
+        self.in_use = []
+        self._ramp = np.empty(0)
+
+    def take(self, size, dtype=float):
+        """Get an uninitialised buffer of the given size and dtype."""
+        key = (size, np.dtype(dtype))
+        buffer = self.free[key].pop() if self.free[key] else np.empty(size, dtype=dtype)
+        self.in_use.append(buffer)
+        return buffer
+
+    def zeros(self, size, dtype=float):
+        """Get a zero-filled buffer of the given size and dtype."""
+        buffer = self.take(size, dtype)
+        buffer.fill(0)
+        return buffer
+
+    def ramp(self, size):
+        """Get a read-only 0, 1, 2, ... ramp of the given size, shared between renders."""
+        if len(self._ramp) < size:
+            self._ramp = np.arange(size, dtype=float)
+            self._ramp.flags.writeable = False
+        return self._ramp[:size]
+
+    def reset(self):
+        """Return every buffer taken since the last reset to the pool."""
+        self.free = defaultdict(list)
+        for buffer in self.in_use:
+            self.free[(len(buffer), buffer.dtype)].append(buffer)
+        self.in_use = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
@@ -0,0 +1,169 @@
+"""
+Command-line renderer.
+
+    python -m cli render --preset NAME [--db synth.db] [--user UID] --output out.wav
+    python -m cli render --json preset.txt --duration 2 --sample-rate 48000 --format int24 --output out.wav
+    python -m cli render --preset NAME --output-rate 44100 --output out.wav
+    python -m cli check-precision [--preset NAME | --json FILE | --all] [--min-snr 90]
+    python -m cli info
+
+--json takes a preset exported from the Presets tab. Nothing here imports
+Tk or matplotlib, so a render starts as soon as NumPy is loaded.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import parallel
+import precision
+from engine import DEFAULT_SAMPLE_RATE, render
+from kernels import kernel_info
+from preset_store import PresetStore
+from reference_presets import reference_presets, write_impulse_response
+from render_cache import get_cache
+from wav_export import SAMPLE_FORMATS
+
+
+def load_preset(args):
+    """Load the preset named on the command line, or None if it can't be found."""
+    if args.json:
+        try:
+            with open(args.json, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Error importing preset: {e}")
+            return None
+
+    store = PresetStore(args.db, args.user)
+    matches = store.find_presets(args.preset)
+    if not matches:
+        print(f"Error: Preset '{args.preset}' not found.")
+        return None
+    if len(matches) > 1:
+        found = ", ".join(f"{preset_type} preset of user {Uid}" for _, preset_type, Uid, _ in matches)
+        print(f"Error: Preset name '{args.preset}' is ambiguous ({found}); choose one with --user.")
+        return None
+    name, preset_type, _, preset_id = matches[0]
+    return store.load_preset_data(name, preset_type, preset_id)
+
+
+def render_command(args):
+    from batch_render import render_to_wav
+
+    preset_data = load_preset(args)
+    if not preset_data:
+        return 1
+    if preset_data.get("type") not in ("Additive", "Subtractive"):
+        print("Error: Invalid or missing synth type in preset.")
+        return 1
+
+    elapsed, seconds = render_to_wav(preset_data, args.output, args.sample_rate, args.duration, args.format, args.output_rate)
+    speed = f"{seconds / elapsed:.0f}x real time" if elapsed > 0 else "instant"
+    print(f"Rendered '{preset_data.get('name')}' ({seconds:.2f} s of audio) in {elapsed:.3f} s, {speed} -> {args.output}")
+    return 0
+
+
+def check_precision_command(args):
+    """
+    Render presets at both precisions and check the float32 error against the float64 reference.
+
+    Without a preset, checks the reference presets, which cover every
+    filter kind, effect, unison and FM; --all checks the database instead.
+    """
+    if args.preset or args.json:
+        presets = [load_preset(args)]
+        if not presets[0]:
+            return 1
+    elif args.all:
+        presets = PresetStore(args.db, args.user).load_presets()
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            ir_path = os.path.join(directory, "reference_ir.wav")
+            write_impulse_response(ir_path)
+            return check_precision(reference_presets(ir_path), args)
+    return check_precision(presets, args)
+
+
+def check_precision(presets, args):
+    """Print the float32 error of each preset; returns 1 if any falls below args.min_snr."""
+    failed = 0
+    for preset_data in presets:
+        renders = {}
+        for name in precision.PRECISIONS:
+            precision.set_precision(name)
+            renders[name] = render(preset_data, args.sample_rate, args.duration)
+        reference = renders["float64"]
+        error = reference - renders["float32"]
+
+        signal_power, error_power = np.sum(reference ** 2), np.sum(error ** 2)
+        snr = 10 * np.log10(signal_power / error_power) if error_power > 0 else np.inf
+        status = "ok" if snr >= args.min_snr else "FAIL"
+        failed += status == "FAIL"
+        print(f"{status:4} {preset_data.get('name')} ({preset_data['type']}): "
+              f"max error {np.max(np.abs(error), initial=0.0):.2e}, SNR {snr:.1f} dB")
+
+    print(f"{len(presets) - failed} of {len(presets)} presets within {args.min_snr} dB")
+    return 1 if failed else 0
+
+
+def info_command(args):
+    info = kernel_info()
+    print(f"DSP kernel backend: {info['backend']}")
+    if info["numba_version"]:
+        print(f"Numba version: {info['numba_version']}")
+    print(f"Render threads: {parallel.get_workers()}")
+    print(f"Sample precision: {precision.get_precision()}")
+    print(f"Default sample rate: {DEFAULT_SAMPLE_RATE} Hz")
+    cache = get_cache()
+    print(f"Render cache: {cache.directory} (limit {cache.max_bytes // (1024 * 1024)} MB)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Render synth presets without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = commands.add_parser("render", help="Render a preset to a WAV file")
+    source = render_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--preset", help="Name of a preset in the database")
+    source.add_argument("--json", help="Preset file exported from the Presets tab")
+    render_parser.add_argument("--db", default="synth.db", help="Preset database")
+    render_parser.add_argument("--user", type=int, help="Only look at this user's presets")
+    render_parser.add_argument("--duration", type=float, help="Duration in seconds (default: the preset's, or 1)")
+    render_parser.add_argument("--sample-rate", type=int, help="Sample rate in Hz (default: the preset's, or %d)" % DEFAULT_SAMPLE_RATE)
+    render_parser.add_argument("--threads", type=int, help="Render threads (default: CPU count)")
+    render_parser.add_argument("--format", choices=list(SAMPLE_FORMATS), default="float32", help="WAV sample format")
+    render_parser.add_argument("--output-rate", type=int, help="Convert the file to this sample rate (default: the render rate)")
+    render_parser.add_argument("--precision", choices=precision.PRECISIONS, help="Render precision (default: float32)")
+    render_parser.add_argument("--output", required=True, help="WAV file to write")
+    render_parser.set_defaults(handler=render_command)
+
+    check_parser = commands.add_parser("check-precision", help="Compare float32 renders with the float64 reference")
+    check_source = check_parser.add_mutually_exclusive_group()
+    check_source.add_argument("--preset", help="Name of a preset in the database (default: the reference presets)")
+    check_source.add_argument("--json", help="Preset file exported from the Presets tab")
+    check_source.add_argument("--all", action="store_true", help="Every preset in the database")
+    check_parser.add_argument("--db", default="synth.db", help="Preset database")
+    check_parser.add_argument("--user", type=int, help="Only look at this user's presets")
+    check_parser.add_argument("--duration", type=float, help="Duration in seconds (default: the preset's, or 1)")
+    check_parser.add_argument("--sample-rate", type=int, help="Sample rate in Hz")
+    check_parser.add_argument("--min-snr", type=float, default=90.0, help="Lowest acceptable signal-to-error ratio in dB")
+    check_parser.set_defaults(handler=check_precision_command)
+
+    info_parser = commands.add_parser("info", help="Show the render backend")
+    info_parser.set_defaults(handler=info_command)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "threads", None):
+        parallel.set_workers(args.threads)
+    if getattr(args, "precision", None):
+        precision.set_precision(args.precision)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Uniformly partitioned FFT convolution.
+
+A long kernel (a reverb impulse response, a steep FIR filter) is cut into
+partitions of `block_size` samples, and each partition is transformed once.
+The input is processed in blocks of the same size with overlap-save: each
+block's spectrum goes into a frequency-domain delay line, and every output
+block is the inverse FFT of the delay line multiplied by the partition
+spectra. The cost per sample grows with the number of partitions, not with
+the kernel length times the block length, so multi-second kernels run in
+real time.
+"""
+import os
+import struct
+from functools import lru_cache
+import numpy as np
+
+import precision
+from resampler import resample
+
+
+DEFAULT_BLOCK_SIZE = 1024
+
+# What loading an impulse response raises for a missing or unreadable file, or
+# one scipy.io.wavfile can't parse (unsupported, malformed or truncated)
+IMPULSE_RESPONSE_ERRORS = (
+    OSError, EOFError, ValueError, TypeError, ZeroDivisionError, UnboundLocalError, MemoryError, struct.error,
+)
+
+
+def partition_kernel(kernel, block_size, dtype=float):
+    """
+    Split a kernel into partitions and transform them for overlap-save.
+
+    Returns:
+        np.ndarray: Read-only (partitions, block_size + 1) complex spectra,
+            each of one partition zero-padded to 2 * block_size.
+    """
+    count = max(1, -(-len(kernel) // block_size))
+    partitions = np.zeros(count * block_size)
+    partitions[:len(kernel)] = kernel
+    padded = np.zeros((count, 2 * block_size))
+    padded[:, :block_size] = partitions.reshape(count, block_size)
+    spectra = np.fft.rfft(padded, axis=1).astype(precision.complex_dtype(dtype))
+    spectra.flags.writeable = False
+    return spectra
+
+
+class PartitionedConvolver:
+    """
+    Streams a signal through a partitioned kernel.
+
+    Input is gathered into blocks of `block_size` samples, so the output is
+    delayed by `latency` (= block_size) samples; process() accepts blocks of
+    any length and returns as many samples as it was given.
+    """
+
+    def __init__(self, spectra, block_size, dtype=float):
+        """
+        Args:
+            spectra (np.ndarray): Partition spectra from partition_kernel().
+            block_size (int): The partition size the spectra were made with.
+            dtype: Sample dtype of the output.
+        """
+        self.spectra = spectra
+        self.block_size = block_size
+        self.latency = block_size
+        self.dtype = np.dtype(dtype)
+        self.reset()
+
+    def reset(self):
+        """Clear the delay line and the input and output queues."""
+        count, bins = self.spectra.shape
+        # Every spectrum is stored twice, count slots apart, so the newest
+        # `count` of them are always one contiguous (reversed) slice
+        self.delay_line = np.zeros((2 * count, bins), dtype=self.spectra.dtype)
+        self.head = 0
+        self.previous = np.zeros(self.block_size, dtype=self.dtype)
+        self.pending = np.zeros(0, dtype=self.dtype)
+        self.ready = np.zeros(self.latency, dtype=self.dtype)
+
+    def convolve_block(self, block):
+        """Convolve one full partition-sized block."""
+        count = len(self.spectra)
+        spectrum = np.fft.rfft(np.concatenate((self.previous, block)))
+        self.previous = block
+        self.head = (self.head + 1) % count
+        self.delay_line[self.head] = spectrum
+        self.delay_line[self.head + count] = spectrum
+
+        recent = self.delay_line[self.head + count:self.head:-1]  # Newest first
+        output = np.fft.irfft(np.einsum("pk,pk->k", self.spectra, recent), 2 * self.block_size)
+        return output[self.block_size:].astype(self.dtype, copy=False)
+
+    def process(self, block):
+        """Convolve a block of any length, returning the output `latency` samples behind."""
+        self.pending = np.concatenate((self.pending, block))
+        full = len(self.pending) // self.block_size * self.block_size
+        outputs = [self.ready]
+        for start in range(0, full, self.block_size):
+            outputs.append(self.convolve_block(self.pending[start:start + self.block_size]))
+        self.pending = self.pending[full:]
+
+        ready = np.concatenate(outputs)
+        self.ready = ready[len(block):]
+        return ready[:len(block)]
+
+
+def load_impulse_response(path, sample_rate):
+    """
+    Load an impulse response from a WAV file as mono float samples at the given rate.
+
+    Integer files are scaled to ±1 (8-bit files are unsigned, centred on
+    128), multichannel files are averaged, and the response is converted to
+    the sample rate if the file's differs. It is normalized to unit energy,
+    so the reverb is about as loud as the dry signal.
+    """
+    import scipy.io.wavfile as wavfile  # Only loaded when a reverb is actually used
+
+    file_rate, data = wavfile.read(path)
+    if data.dtype == np.uint8:
+        data = (data - 128.0) / 128.0
+    elif np.issubdtype(data.dtype, np.integer):
+        data = data / float(np.iinfo(data.dtype).max)
+    data = np.asarray(data, dtype=float)
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    data = resample(data, file_rate, sample_rate)
+
+    energy = np.sqrt(np.sum(data ** 2))
+    return data / energy if energy > 0 else data
+
+
+@lru_cache(maxsize=8)
+def _impulse_response_spectra(path, modified, block_size, sample_rate, dtype):
+    return partition_kernel(load_impulse_response(path, sample_rate), block_size, dtype)
+
+
+def impulse_response_spectra(path, block_size, sample_rate, dtype=float):
+    """
+    Get the partition spectra of an impulse response file, cached per (file, block size, sample rate).
+
+    The file's modification time is part of the cache key, so an edited IR
+    is loaded again. Raises one of IMPULSE_RESPONSE_ERRORS if the file can't
+    be loaded.
+    """
+    path = os.path.abspath(path)
+    return _impulse_response_spectra(path, os.path.getmtime(path), block_size, sample_rate, np.dtype(dtype).name)
@@ -0,0 +1,553 @@
+"""
+Streaming effect processors.
+
+Every effect is an object with reset() and process(block, out=None). Each
+keeps its own phase, delay-line and hold state, and time-varying behaviour is
+driven from the absolute stream position, so feeding a signal through in one
+call or in blocks of any size gives the same output. process() writes into
+`out` when given (which may be the input block itself) and returns it.
+
+Every effect takes the sample dtype as its last argument and keeps its
+delay lines and outputs in it; sweep phases and read positions are always
+computed in float64.
+"""
+import threading
+import numpy as np
+from filters import control_blocks
+from convolution import DEFAULT_BLOCK_SIZE, IMPULSE_RESPONSE_ERRORS, PartitionedConvolver, impulse_response_spectra
+from kernels import feedback_delay, time_varying_sosfilt
+from oversampling import OVERSAMPLING_FACTORS, Oversampled
+
+
+_reported_errors = set()
+_reported_errors_lock = threading.Lock()
+
+
+def report_effect_error(effect_type, message):
+    """
+    Report an effect that can't run as configured; the render goes on without it.
+
+    Every render creates its own effects, often on several threads at once,
+    so each distinct error is reported only once.
+    """
+    with _reported_errors_lock:
+        if (effect_type, message) in _reported_errors:
+            return
+        _reported_errors.add((effect_type, message))
+    print(f"Error in {effect_type}: {message}")
+
+
+def read_fractional(line, positions):
+    """Read a delay line at (any shape of) fractional positions with linear interpolation."""
+    index = positions.astype(int)
+    frac = (positions - index).astype(line.dtype, copy=False)
+    return line[index] * (1 - frac) + line[index + 1] * frac
+
+
+class Bitcrusher:
+    """Quantizes the signal to fewer bits and holds every Nth sample."""
+
+    PARAMETERS = ("bit_depth", "sample_rate_reduction")
+    # Counted in samples, so they scale with the oversampling factor
+    SAMPLE_PARAMETERS = ("sample_rate_reduction",)
+
+    def __init__(self, sample_rate, bit_depth=8, sample_rate_reduction=4, dtype=float):
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.levels = 2 ** (int(bit_depth) - 1)
+        self.hold = max(1, int(sample_rate_reduction))
+        self.reset()
+
+    def reset(self):
+        """Restart the hold period."""
+        self.position = 0
+        self.held = 0.0
+
+    def process(self, block, out=None):
+        """Process one block, carrying the held sample over to the next call."""
+        num_samples = len(block)
+        if out is None:
+            out = np.empty(num_samples, dtype=self.dtype)
+
+        # Quantize in place
+        np.multiply(block, self.levels, out=out)
+        np.round(out, out=out)
+        out /= self.levels
+
+        # Every sample takes the quantized value from the start of its hold
+        # period; periods that began in an earlier block use the held value
+        source = np.arange(num_samples)
+        source[(self.position + source) % self.hold != 0] = -1
+        np.maximum.accumulate(source, out=source)
+        crushed = out[source]
+        crushed[source < 0] = self.held
+        np.copyto(out, crushed)
+
+        if num_samples:
+            self.held = out[-1]
+        self.position += num_samples
+        return out
+
+
+class RingModulator:
+    """Multiplies the signal by a sine wave."""
+
+    PARAMETERS = ("mod_freq",)
+
+    def __init__(self, sample_rate, mod_freq=100.0, dtype=float):
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.mod_freq = float(mod_freq)
+        self.reset()
+
+    def reset(self):
+        """Restart the modulator phase."""
+        self.position = 0
+
+    def process(self, block, out=None):
+        """Process one block, carrying the modulator phase over to the next call."""
+        num_samples = len(block)
+        positions = self.position + np.arange(num_samples)
+        modulator = np.sin(2 * np.pi * self.mod_freq / self.sample_rate * positions).astype(self.dtype, copy=False)
+        self.position += num_samples
+        return np.multiply(block, modulator, out=out)
+
+
+class Wavefolder:
+    """Folds the rectified signal back down whenever it passes the threshold."""
+
+    PARAMETERS = ("threshold",)
+
+    def __init__(self, sample_rate, threshold=0.5, dtype=float):
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.threshold = float(threshold)
+
+    def reset(self):
+        """The wavefolder is stateless; nothing to reset."""
+
+    def process(self, block, out=None):
+        """Process one block."""
+        out = np.abs(block, out=out)
+        np.subtract(2 * self.threshold, out, out=out, where=out > self.threshold)
+        return out
+
+
+class Phaser:
+    """
+    A phaser built from a cascade of LFO-swept first-order all-pass stages.
+
+    The all-pass coefficient is updated once per `block_size` samples and all
+    stages share it, so each control block runs the whole chain as one cascade
+    of first-order sections whose state is carried between blocks.
+    """
+
+    PARAMETERS = ("num_stages", "sweep_freq", "depth")
+
+    def __init__(self, sample_rate, num_stages=4, sweep_freq=0.5, depth=0.5, block_size=64, dtype=float):
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.num_stages = max(1, int(num_stages))
+        self.sweep_freq = float(sweep_freq)
+        self.depth = float(depth)
+        self.block_size = block_size
+        self.reset()
+
+    def reset(self):
+        """Clear the all-pass state and restart the sweep."""
+        self.zi = np.zeros((self.num_stages, 2), dtype=self.dtype)
+        self.position = 0
+        self.sos = self.stage_sections(np.array([0]))[0]
+
+    def stage_sections(self, positions):
+        """Build the all-pass cascade for the sweep position at each sample index."""
+        # Sweep the break frequency around 1 kHz, two octaves either way at full depth
+        sweep = np.sin(2 * np.pi * self.sweep_freq * positions / self.sample_rate)
+        break_freq = np.clip(1000.0 * 4.0 ** (self.depth * sweep), 20, 0.45 * self.sample_rate)
+        tan = np.tan(np.pi * break_freq / self.sample_rate)
+        coefficient = (tan - 1) / (tan + 1)
+
+        # H(z) = (a + z^-1) / (1 + a z^-1), written as a second-order section
+        sections = np.zeros((len(positions), self.num_stages, 6), dtype=self.dtype)
+        sections[:, :, 0] = coefficient[:, None]
+        sections[:, :, 1] = 1.0
+        sections[:, :, 3] = 1.0
+        sections[:, :, 4] = coefficient[:, None]
+        return sections
+
+    def process(self, block, out=None):
+        """Process one block, carrying the sweep and all-pass state over to the next call."""
+        num_samples = len(block)
+        wet = np.empty(num_samples, dtype=self.dtype)
+
+        first, starts = control_blocks(self.position, num_samples, self.block_size)
+        cells = self.stage_sections(self.position + starts)
+        if first:
+            cells = np.concatenate((self.sos[None], cells))
+            starts = np.concatenate(([0], starts))
+
+        time_varying_sosfilt(block, cells, starts, self.zi, wet)
+        if len(cells):
+            self.sos = cells[-1]
+        self.position += num_samples
+
+        # Mixing the phase-shifted copy with the dry signal creates the moving notches
+        out = np.add(block, wet, out=out)
+        out *= 0.5
+        return out
+
+
+class Flanger:
+    """
+    A flanger built on an LFO-modulated fractional delay line.
+
+    Delay times for a whole block are computed at once and read back with
+    linear interpolation in a single gather. Feedback makes the line
+    recursive, so it is handled by the feedback_delay kernel.
+    """
+
+    PARAMETERS = ("max_delay", "rate", "feedback")
+
+    def __init__(self, sample_rate, max_delay=5.0, rate=0.25, feedback=0.0, min_delay=0.5, dtype=float):
+        """
+        Args:
+            max_delay (float): Longest delay of the sweep, in ms.
+            rate (float): Sweep rate, in Hz.
+            feedback (float): Amount of the delayed signal fed back into the line.
+            min_delay (float): Shortest delay of the sweep, in ms.
+        """
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.min_delay = max(2.0, min_delay * sample_rate / 1000)  # In samples
+        self.max_delay = max(self.min_delay, max_delay * sample_rate / 1000)
+        self.rate = float(rate)
+        self.feedback = float(np.clip(feedback, -0.95, 0.95))
+        self.history_size = int(np.ceil(self.max_delay)) + 2
+        self.reset()
+
+    def reset(self):
+        """Empty the delay line and restart the sweep."""
+        self.history = np.zeros(self.history_size, dtype=self.dtype)
+        self.position = 0
+
+    def delays(self, positions):
+        """Get the delay (in samples) at each absolute sample index."""
+        sweep = 0.5 * (1 + np.sin(2 * np.pi * self.rate * positions / self.sample_rate))
+        return self.min_delay + (self.max_delay - self.min_delay) * sweep
+
+    def process(self, block, out=None):
+        """Process one block, carrying the delay line and sweep over to the next call."""
+        num_samples = len(block)
+        offsets = np.arange(num_samples)
+
+        # The delay line is the previous history followed by this block
+        line = np.concatenate((self.history, block))
+        read_positions = self.history_size + offsets - self.delays(self.position + offsets)
+
+        if not self.feedback:
+            delayed = read_fractional(line, read_positions)
+        else:
+            delayed = feedback_delay(
+                line, read_positions, self.history_size, self.feedback, self.min_delay, np.empty(num_samples, dtype=self.dtype)
+            )
+
+        self.history = line[-self.history_size:].copy()
+        self.position += num_samples
+
+        out = np.add(block, delayed, out=out)
+        out *= 0.5
+        return out
+
+
+class Chorus:
+    """
+    A multi-voice chorus reading one shared delay line.
+
+    Each voice sweeps its own delay time with an LFO at a different phase. All
+    voices are read together in one 2-D fractional gather per chunk and summed,
+    so only a (voices x chunk) scratch array exists besides the line itself.
+    """
+
+    PARAMETERS = ("detune", "delay", "voices")
+
+    def __init__(self, sample_rate, detune=0.02, delay=5.0, voices=3, rate=0.8, chunk_size=1024, dtype=float):
+        """
+        Args:
+            detune (float): Pitch wobble of each voice; 0.1 bends by up to 1%.
+            delay (float): Centre delay of the voices, in ms.
+            voices (int): Number of delayed voices mixed with the dry signal.
+            rate (float): Sweep rate of the voice LFOs, in Hz.
+        """
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.num_voices = max(1, int(voices))
+        self.base_delay = max(2.0, delay * sample_rate / 1000)  # In samples
+        self.chunk_size = chunk_size
+
+        # A delay swept as depth * sin(wt) bends the pitch by up to depth * w
+        omega = 2 * np.pi * rate
+        depth = (detune / 10) / omega * sample_rate
+        self.depth = min(depth, self.base_delay - 1)
+
+        # Spread the voice LFOs in phase and slightly in rate so they don't move together
+        self.phases = (2 * np.pi * np.arange(self.num_voices) / self.num_voices)[:, None]
+        self.omegas = (omega * (1 + 0.1 * np.linspace(-1, 1, self.num_voices)) / sample_rate)[:, None]
+
+        self.history_size = int(np.ceil(self.base_delay + self.depth)) + 2
+        self.reset()
+
+    def reset(self):
+        """Empty the delay line and restart the voice LFOs."""
+        self.history = np.zeros(self.history_size, dtype=self.dtype)
+        self.position = 0
+
+    def process(self, block, out=None):
+        """Process one block, carrying the delay line and LFO phases over to the next call."""
+        num_samples = len(block)
+        line = np.concatenate((self.history, block))
+        output = line[self.history_size:].copy() if out is None else out
+        if output is not block:
+            output[:] = block  # Dry signal
+
+        for start in range(0, num_samples, self.chunk_size):
+            offsets = np.arange(start, min(start + self.chunk_size, num_samples))
+            delays = self.base_delay + self.depth * np.sin(self.omegas * (self.position + offsets) + self.phases)
+            output[offsets] += read_fractional(line, self.history_size + offsets - delays).sum(axis=0)
+
+        self.history = line[-self.history_size:].copy()
+        self.position += num_samples
+
+        output /= self.num_voices + 1
+        return output
+
+
+class ConvolutionReverb:
+    """
+    Convolves the signal with an impulse response loaded from a WAV file.
+
+    The response is applied by a uniformly partitioned convolver, which
+    delays the wet signal by `block_size` samples. The dry signal is delayed
+    to match, so the two stay aligned, and the whole effect reports that
+    delay as its `latency` for the render to remove. Without a readable
+    response the signal passes through dry, without latency.
+    """
+
+    PARAMETERS = ("ir_path", "mix")
+
+    def __init__(self, sample_rate, ir_path="", mix=0.3, block_size=DEFAULT_BLOCK_SIZE, dtype=float):
+        """
+        Args:
+            ir_path (str): WAV file holding the impulse response.
+            mix (float): Share of the reverberated signal in the output.
+            block_size (int): Partition size of the convolver, in samples.
+        """
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.mix = float(mix)
+        self.convolver = None
+        self.latency = 0
+        if ir_path:
+            try:
+                spectra = impulse_response_spectra(ir_path, block_size, sample_rate, self.dtype)
+                self.convolver = PartitionedConvolver(spectra, block_size, self.dtype)
+                self.latency = self.convolver.latency
+            except IMPULSE_RESPONSE_ERRORS as e:
+                report_effect_error("Convolution Reverb", f"can't load impulse response {ir_path}: {e}")
+        self.reset()
+
+    def reset(self):
+        """Clear the convolver's delay line and the dry delay."""
+        if self.convolver is not None:
+            self.convolver.reset()
+        self.dry_history = np.zeros(self.latency, dtype=self.dtype)
+
+    def process(self, block, out=None):
+        """Process one block, carrying the reverb tail and the delayed dry signal over to the next call."""
+        if out is None:
+            out = np.empty(len(block), dtype=self.dtype)
+        if self.convolver is None:
+            np.copyto(out, block)
+            return out
+
+        wet = self.convolver.process(block)
+        line = np.concatenate((self.dry_history, block))
+        dry, self.dry_history = line[:len(block)], line[len(block):]
+        np.multiply(dry, 1 - self.mix, out=out)
+        out += self.mix * wet
+        return out
+
+
+def hadamard_matrix(size):
+    """Build the orthonormal size x size Hadamard matrix; size must be a power of two."""
+    matrix = np.ones((1, 1))
+    while len(matrix) < size:
+        matrix = np.block([[matrix, matrix], [matrix, -matrix]])
+    return matrix / np.sqrt(size)
+
+
+def next_prime(n):
+    """Get the smallest prime at or above n."""
+    n = max(2, int(n))
+    while any(n % divisor == 0 for divisor in range(2, int(n ** 0.5) + 1)):
+        n += 1
+    return n
+
+
+class AlgorithmicReverb:
+    """
+    A feedback delay network reverb.
+
+    Eight or sixteen delay lines of mutually prime lengths feed back into
+    each other through an orthonormal Hadamard matrix, so the mixing is
+    lossless and only the per-line gains set the decay time. Within a chunk
+    no longer than the shortest line, every sample read comes from an earlier
+    chunk, so all lines advance together: one gather, one damping lowpass
+    over the chunk and one matrix product per chunk.
+    """
+
+    PARAMETERS = ("decay", "size", "damping", "mix", "lines")
+
+    def __init__(self, sample_rate, decay=1.5, size=1.0, damping=0.3, mix=0.3, lines=8, dtype=float):
+        """
+        Args:
+            decay (float): Time for the tail to fall by 60 dB, in seconds.
+            size (float): Scales the delay lengths; larger sounds like a bigger room.
+            damping (float): How much faster high frequencies decay, from 0 to 1.
+            mix (float): Share of the reverberated signal in the output.
+            lines (int): Number of delay lines, 8 or 16.
+        """
+        self.sample_rate = sample_rate
+        self.dtype = np.dtype(dtype)
+        self.mix = float(mix)
+        self.num_lines = 16 if int(round(float(lines))) > 8 else 8
+        self.damping = float(np.clip(damping, 0.0, 0.95))
+
+        # Line lengths spread geometrically between about 30 and 75 ms at size 1
+        lengths = np.geomspace(0.03, 0.075, self.num_lines) * max(0.1, float(size)) * sample_rate
+        self.delays = np.array([next_prime(length) for length in lengths])
+        self.chunk_size = int(self.delays.min())
+        self.line_size = int(self.delays.max())
+
+        # Each pass through a line of d samples should lose 60 dB * d / (decay * sample_rate)
+        gains = 10.0 ** (-3.0 * self.delays / (max(0.01, float(decay)) * sample_rate))
+        self.feedback = (hadamard_matrix(self.num_lines) * gains).astype(self.dtype)
+        self.output_gain = 1 / np.sqrt(self.num_lines)
+        self.reset()
+
+    def reset(self):
+        """Empty the delay lines and the damping filters."""
+        self.lines = np.zeros((self.num_lines, self.line_size), dtype=self.dtype)
+        self.damping_state = np.zeros((self.num_lines, 1), dtype=self.dtype)
+        self.position = 0
+
+    def process(self, block, out=None):
+        """Process one block, carrying the delay lines over to the next call."""
+        from scipy.signal import lfilter  # Deferred like every scipy.signal import; see filters.py
+
+        num_samples = len(block)
+        wet = np.empty(num_samples, dtype=self.dtype)
+        rows = np.arange(self.num_lines)[:, None]
+        for start in range(0, num_samples, self.chunk_size):
+            stop = min(start + self.chunk_size, num_samples)
+            offsets = self.position + np.arange(stop - start)
+            reads = self.lines[rows, (offsets - self.delays[:, None]) % self.line_size]
+            wet[start:stop] = reads.sum(axis=0) * self.output_gain
+
+            if self.damping:
+                reads, self.damping_state = lfilter(
+                    [1 - self.damping], [1, -self.damping], reads, axis=1, zi=self.damping_state
+                )
+            writes = self.feedback @ reads.astype(self.dtype, copy=False)
+            writes += block[start:stop]
+            self.lines[rows, offsets % self.line_size] = writes
+            self.position += stop - start
+
+        if out is None:
+            out = np.empty(num_samples, dtype=self.dtype)
+        np.multiply(block, 1 - self.mix, out=out)
+        out += self.mix * wet
+        return out
+
+
+EFFECT_PROCESSORS = {
+    "Bitcrusher": Bitcrusher,
+    "Ring Modulation": RingModulator,
+    "Phaser": Phaser,
+    "Flanger": Flanger,
+    "Wavefolder": Wavefolder,
+    "Chorus": Chorus,
+    "Convolution Reverb": ConvolutionReverb,
+    "Algorithmic Reverb": AlgorithmicReverb,
+}
+
+EFFECT_TYPES = list(EFFECT_PROCESSORS)
+
+# Effects whose nonlinearity aliases, for which the UI offers oversampling
+OVERSAMPLED_EFFECTS = ["Bitcrusher", "Ring Modulation", "Wavefolder"]
+
+
+def create_effect(effect_type, sample_rate, params, dtype=float):
+    """
+    Create the processor for one effect.
+
+    Args:
+        effect_type (str): One of EFFECT_TYPES.
+        sample_rate (int): The sample rate the effect runs at.
+        params (dict): Effect parameters; keys the effect doesn't use are ignored.
+            An "oversampling" factor of 2, 4 or 8 runs the effect oversampled.
+        dtype: Sample dtype the effect runs at.
+
+    Returns:
+        The effect processor, or None for an unknown effect type.
+    """
+    processor = EFFECT_PROCESSORS.get(effect_type)
+    if processor is None:
+        report_effect_error(effect_type, "unknown effect type, skipping it")
+        return None
+
+    # Snap the factor to the nearest supported one, since slider values arrive as floats
+    factor = min(OVERSAMPLING_FACTORS, key=lambda f: abs(f - float(params.get("oversampling", 1))))
+    kwargs = {key: params[key] for key in processor.PARAMETERS if key in params}
+    for key in getattr(processor, "SAMPLE_PARAMETERS", ()):
+        if key in kwargs:
+            kwargs[key] = float(kwargs[key]) * factor
+
+    effect = processor(sample_rate * factor, **kwargs, dtype=dtype)
+    return Oversampled(effect, factor, dtype) if factor > 1 else effect
+
+
+class EffectChain:
+    """
+    A chain of effect processors run in order on each block.
+
+    Oversampled effects and the convolution reverb delay the signal;
+    `latency` is the chain's total delay in samples, and flush() returns
+    the output still held back.
+    """
+
+    def __init__(self, effects):
+        self.effects = [effect for effect in effects if effect is not None]
+        self.latency = sum(getattr(effect, "latency", 0) for effect in self.effects)
+
+    def reset(self):
+        """Reset every effect in the chain."""
+        for effect in self.effects:
+            effect.reset()
+
+    def process(self, block, out=None):
+        """Run one block through every effect in turn."""
+        if out is None:
+            out = np.empty(len(block), dtype=block.dtype)
+        if not self.effects:
+            np.copyto(out, block)
+            return out
+
+        source = block
+        for effect in self.effects:
+            effect.process(source, out)
+            source = out  # Later effects work in place
+        return out
+
+    def flush(self, dtype=float):
+        """Get the last `latency` samples still held in the chain."""
+        return self.process(np.zeros(self.latency, dtype=dtype))
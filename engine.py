@@ -0,0 +1,452 @@
+"""
+Headless synthesis engine.
+
+The models below describe presets as plain data, and render() turns a
+preset into samples without creating any Tk widget, so batch jobs and
+scripts can import this module without customtkinter or matplotlib. The
+synth UIs are views that read their widgets into these models and call the
+same render functions.
+
+Models round-trip through from_dict()/to_dict() using the same dict layout
+the preset manager stores.
+"""
+from dataclasses import dataclass, field
+import numpy as np
+
+import parallel
+import precision
+from render_plan import compile_preset, to_float
+
+
+DEFAULT_SAMPLE_RATE = 32768
+
+# Part of every render cache key. Any change that alters rendered audio
+# (DSP, latency, defaults, stored parameters) must bump it in the same
+# commit, or RenderCache.get() keeps returning renders made by older code.
+ENGINE_VERSION = 10
+
+
+@dataclass(slots=True)
+class OscillatorSettings:
+    type: str = "Sine"
+    frequency: float = 440.0
+    amplitude: float = 0.5
+    unison: int = 1
+    detune: float = 0.0
+    spread: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("type", "Sine"),
+            to_float(data.get("frequency"), 440.0),
+            to_float(data.get("amplitude"), 0.5),
+            int(to_float(data.get("unison"), 1)),
+            to_float(data.get("detune"), 0.0),
+            to_float(data.get("spread"), 0.0),
+        )
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "frequency": self.frequency,
+            "amplitude": self.amplitude,
+            "unison": self.unison,
+            "detune": self.detune,
+            "spread": self.spread,
+        }
+
+
+@dataclass(slots=True)
+class FilterSettings:
+    type: str = "Low-pass"
+    cutoff: float = 1000.0
+    resonance: float = 1.0
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("type", "Low-pass"), to_float(data.get("cutoff"), 1000.0), to_float(data.get("resonance"), 1.0))
+
+    def to_dict(self):
+        return {"type": self.type, "cutoff": self.cutoff, "resonance": self.resonance}
+
+
+@dataclass(slots=True)
+class EffectSettings:
+    type: str = "Bitcrusher"
+    params: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("type", "Bitcrusher"), dict(data.get("params") or {}))
+
+    def to_dict(self):
+        return {"type": self.type, "params": dict(self.params)}
+
+
+@dataclass(slots=True)
+class LFOSettings:
+    shape: str = "Sine"
+    frequency: float = 1.0
+    depth: float = 0.5
+    target: str = "Frequency"
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get("shape", "Sine"),
+            to_float(data.get("frequency"), 1.0),
+            to_float(data.get("depth"), 0.5),
+            data.get("target", "Frequency"),
+        )
+
+    def to_dict(self):
+        return {"shape": self.shape, "frequency": self.frequency, "depth": self.depth, "target": self.target}
+
+
+@dataclass(slots=True)
+class FMSettings:
+    source: int = 0
+    target: int = 0
+    depth: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(int(to_float(data.get("source"), 0)), int(to_float(data.get("target"), 0)), to_float(data.get("depth"), 0.0))
+
+    def to_dict(self):
+        return {"source": self.source, "target": self.target, "depth": self.depth}
+
+
+@dataclass(slots=True)
+class ADSR:
+    attack: float = 0.1
+    decay: float = 0.1
+    sustain: float = 0.7
+    release: float = 0.7
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*(to_float(data.get(key), default) for key, default in
+                     (("attack", 0.1), ("decay", 0.1), ("sustain", 0.7), ("release", 0.7))))
+
+    def to_dict(self):
+        return {"attack": self.attack, "decay": self.decay, "sustain": self.sustain, "release": self.release}
+
+
+@dataclass(slots=True)
+class SubtractivePreset:
+    name: str = None
+    volume: float = 0.5
+    oscillators: list = field(default_factory=list)
+    filters: list = field(default_factory=list)
+    effects: list = field(default_factory=list)
+    lfos: list = field(default_factory=list)
+    fm: list = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            name=data.get("name"),
+            volume=to_float(data.get("volume"), 0.5),
+            oscillators=[OscillatorSettings.from_dict(osc) for osc in data.get("oscillators", [])],
+            filters=[FilterSettings.from_dict(filt) for filt in data.get("filters", [])],
+            effects=[EffectSettings.from_dict(effect) for effect in data.get("effects", [])],
+            lfos=[LFOSettings.from_dict(lfo) for lfo in data.get("lfos", [])],
+            fm=[FMSettings.from_dict(edge) for edge in data.get("fm", [])],
+        )
+
+    def to_dict(self):
+        return {
+            "type": "Subtractive",
+            "name": self.name,
+            "volume": self.volume,
+            "oscillators": [osc.to_dict() for osc in self.oscillators],
+            "filters": [filt.to_dict() for filt in self.filters],
+            "effects": [effect.to_dict() for effect in self.effects],
+            "lfos": [lfo.to_dict() for lfo in self.lfos],
+            "fm": [edge.to_dict() for edge in self.fm],
+        }
+
+
+@dataclass(slots=True)
+class AdditivePreset:
+    name: str = None
+    base_frequency: float = 440.0
+    sample_rate: int = DEFAULT_SAMPLE_RATE
+    duration: float = 1.0
+    volume: float = 0.5
+    tone: float = 0.5
+    num_harmonics: int = 10
+    rolloff: float = 1.0
+    adsr: ADSR = field(default_factory=ADSR)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            name=data.get("name"),
+            base_frequency=to_float(data.get("base_frequency"), 440.0),
+            sample_rate=int(to_float(data.get("sample_rate"), DEFAULT_SAMPLE_RATE)),
+            duration=to_float(data.get("duration"), 1.0),
+            volume=to_float(data.get("volume"), 0.5),
+            tone=to_float(data.get("tone"), 0.5),
+            num_harmonics=int(to_float(data.get("num_harmonics"), 10)),
+            rolloff=to_float(data.get("rolloff"), 1.0),
+            adsr=ADSR.from_dict(data.get("adsr") or {}),
+        )
+
+    def to_dict(self):
+        return {
+            "type": "Additive",
+            "name": self.name,
+            "base_frequency": self.base_frequency,
+            "sample_rate": self.sample_rate,
+            "duration": self.duration,
+            "volume": self.volume,
+            "tone": self.tone,
+            "num_harmonics": self.num_harmonics,
+            "rolloff": self.rolloff,
+            "adsr": self.adsr.to_dict(),
+        }
+
+
+def load_preset(data):
+    """Build the model for a preset dict, based on its "type"."""
+    if data.get("type") == "Additive":
+        return AdditivePreset.from_dict(data)
+    if data.get("type") == "Subtractive":
+        return SubtractivePreset.from_dict(data)
+    raise ValueError(f"Unknown synth type '{data.get('type')}'")
+
+
+def adsr_envelope(adsr, num_samples, sample_rate, dtype=float, start=0, stop=None):
+    """
+    Generate an ADSR envelope for the entire duration, or the part of it from start to stop.
+
+    If the attack, decay and release don't fit, they are scaled down to fit.
+    Every sample is computed from its own index, so an envelope built piece by
+    piece is identical to one built in one go.
+    """
+    attack_samples = int(adsr.attack * sample_rate)
+    decay_samples = int(adsr.decay * sample_rate)
+    release_samples = int(adsr.release * sample_rate)
+    sustain_samples = num_samples - attack_samples - decay_samples - release_samples
+
+    if sustain_samples < 0:
+        # If the total ADSR time exceeds the duration, scale the times
+        scale_factor = num_samples / (attack_samples + decay_samples + release_samples)
+        attack_samples = int(attack_samples * scale_factor)
+        decay_samples = int(decay_samples * scale_factor)
+        sustain_samples = 0
+    release_samples = num_samples - attack_samples - decay_samples - sustain_samples
+
+    stop = num_samples if stop is None else stop
+    envelope = np.empty(stop - start, dtype=dtype)
+    segment_start = 0
+    for length, first, last in (
+        (attack_samples, 0.0, 1.0),  # Attack
+        (decay_samples, 1.0, adsr.sustain),  # Decay
+        (sustain_samples, adsr.sustain, adsr.sustain),  # Sustain
+        (release_samples, adsr.sustain, 0.0),  # Release
+    ):
+        low, high = max(start, segment_start), min(stop, segment_start + length)
+        if low < high:
+            # The same ramp np.linspace(first, last, length) builds, for just these indices
+            index = np.arange(low - segment_start, high - segment_start)
+            if length > 1:
+                ramp = index * ((last - first) / (length - 1)) + first
+                if high == segment_start + length:
+                    ramp[-1] = last
+            else:
+                ramp = np.full(len(index), first)
+            envelope[low - start:high - start] = ramp
+        segment_start += length
+    return envelope
+
+
+def harmonic_amplitudes(preset):
+    """Get the amplitude of each harmonic, after roll-off and tone."""
+    amplitudes = 1 / (np.arange(1, preset.num_harmonics + 1)) ** preset.rolloff
+
+    # Enhanced tone control: Apply a nonlinear scaling factor
+    if preset.tone < 0.5:
+        # Reduce even harmonics more aggressively
+        even_reduction = 1 - (preset.tone * 2)  # Scale from 1 to 0 as tone goes from 0 to 0.5
+        amplitudes[::2] *= even_reduction ** 2  # Square the reduction for a more pronounced effect
+    else:
+        # Reduce odd harmonics more aggressively
+        odd_reduction = (preset.tone - 0.5) * 2  # Scale from 0 to 1 as tone goes from 0.5 to 1
+        amplitudes[1::2] *= odd_reduction ** 2  # Square the reduction for a more pronounced effect
+    return amplitudes
+
+
+def harmonic_frame(bins, amplitudes, length, workers=None, dtype=float):
+    """
+    Sum cosines at FFT bins into one frame.
+
+    Only a few dozen bins are ever set, so summing their cosines directly is
+    the same as the inverse FFT of the sparse spectrum (including its 1 / length
+    scale) but far cheaper. Long frames are split into segments across the
+    thread pool.
+
+    Args:
+        bins (np.ndarray): Integer bin index of each partial.
+        amplitudes (np.ndarray): Amplitude of each partial.
+        length (int): Frame length, i.e. the IFFT size.
+        dtype: Sample dtype of the frame; the angles are always float64.
+    """
+    frame = np.zeros(length, dtype=dtype)
+
+    def render_segment(start, stop):
+        n = np.arange(start, stop)
+        angle = np.empty(stop - start)
+        for k, amp in zip(bins, amplitudes):
+            # k * n is exact in float64, so reducing it modulo the frame length first keeps the angle exact
+            np.multiply(k, n, out=angle, casting="unsafe")
+            np.mod(angle, length, out=angle)
+            angle *= 2 * np.pi / length
+            np.cos(angle, out=angle)
+            angle *= amp / length
+            frame[start:stop] += angle
+
+    parallel.run(render_segment, *zip(*parallel.segments(length, workers)))
+    return frame
+
+
+def additive_frame(preset, sample_rate, frame_duration=1.0, workers=None):
+    """
+    Build the single frame an additive preset repeats, scaled to the preset's volume.
+
+    Args:
+        preset (AdditivePreset): The preset to render.
+        sample_rate (int): The sample rate to render at.
+        frame_duration (float): Length of the IFFT frame in seconds.
+        workers (int): Render threads, defaulting to the configured count.
+    """
+    # Place the harmonics in the frequency domain (a later harmonic in the same bin replaces an earlier one)
+    freqs = np.arange(1, preset.num_harmonics + 1) * preset.base_frequency
+    N = int(sample_rate * frame_duration)
+    num_bins = N // 2 + 1
+    spectrum = {}
+    for freq, amp in zip(freqs, harmonic_amplitudes(preset)):
+        bin_index = int(freq * N / sample_rate)
+        if bin_index < num_bins:
+            spectrum[bin_index] = amp
+
+    # The IFFT pads the spectrum to a power of two and uses that as the frame length
+    length = num_bins if num_bins & (num_bins - 1) == 0 else 2 ** (int(np.log2(num_bins)) + 1)
+    bins = np.array(list(spectrum), dtype=np.int64)
+    frame = harmonic_frame(bins, np.array(list(spectrum.values())), length, workers, precision.get_dtype())
+
+    # Every partial is a cosine starting at its peak, so the frame peaks at its first sample. With no
+    # partial below Nyquist (or every one toned away) the frame is all zeros and stays silent
+    if frame[0] > 0:
+        frame *= preset.volume / frame[0]
+    return frame
+
+
+def additive_blocks(preset, sample_rate=None, duration=None, block_size=1 << 16, frame_duration=1.0, workers=None):
+    """
+    Render an additive preset as a sequence of fixed-size blocks.
+
+    Each block reads the frame at its absolute sample positions, so the tone
+    continues without a phase jump from one block to the next, and takes the
+    matching slice of the ADSR envelope. Only the frame and one block are in
+    memory at a time, whatever the duration.
+
+    Args:
+        preset (AdditivePreset | dict): The preset to render.
+        sample_rate (int): Defaults to the preset's sample rate.
+        duration (float): Defaults to the preset's duration.
+        block_size (int): Samples per block; the last block may be shorter.
+        frame_duration (float): Length of the IFFT frame in seconds.
+        workers (int): Render threads, defaulting to the configured count.
+
+    Yields:
+        np.ndarray: The next block of samples.
+    """
+    if isinstance(preset, dict):
+        preset = AdditivePreset.from_dict(preset)
+    sample_rate = preset.sample_rate if sample_rate is None else sample_rate
+    duration = preset.duration if duration is None else duration
+
+    frame = additive_frame(preset, sample_rate, frame_duration, workers)
+    num_samples = int(sample_rate * duration)
+    for start in range(0, num_samples, block_size):
+        stop = min(start + block_size, num_samples)
+        block = frame[np.arange(start, stop) % len(frame)]
+        block *= adsr_envelope(preset.adsr, num_samples, sample_rate, frame.dtype, start, stop)
+        yield block
+
+
+def render_additive(preset, sample_rate=None, duration=None, frame_duration=1.0, workers=None):
+    """
+    Render an additive preset.
+
+    One frame of frame_duration seconds is built from the harmonic spectrum and repeated to
+    fill the duration, then the ADSR envelope is applied.
+
+    Args:
+        preset (AdditivePreset | dict): The preset to render.
+        sample_rate (int): Defaults to the preset's sample rate.
+        duration (float): Defaults to the preset's duration.
+        frame_duration (float): Length of the IFFT frame in seconds.
+        workers (int): Render threads, defaulting to the configured count.
+    """
+    blocks = list(additive_blocks(preset, sample_rate, duration, frame_duration=frame_duration, workers=workers))
+    return np.concatenate(blocks) if blocks else np.empty(0, dtype=precision.get_dtype())
+
+
+def compile_subtractive(preset, sample_rate, duration):
+    """Compile a subtractive preset (model or dict) into a cached render plan."""
+    if isinstance(preset, dict):
+        preset = SubtractivePreset.from_dict(preset)
+    return compile_preset(preset.to_dict(), sample_rate, duration)
+
+
+def render_subtractive(preset, sample_rate, duration, arena=None, workers=None):
+    """Render a subtractive preset through oscillators, filters and effects."""
+    return compile_subtractive(preset, sample_rate, duration).render(arena, workers)
+
+
+def render(preset, sample_rate=None, duration=None, workers=None):
+    """
+    Render any preset to a waveform.
+
+    Args:
+        preset (AdditivePreset | SubtractivePreset | dict): The preset to render.
+        sample_rate (int): Defaults to the preset's own rate for additive
+            presets, or DEFAULT_SAMPLE_RATE.
+        duration (float): Defaults to the preset's own duration for additive
+            presets, or 1 second.
+        workers (int): Render threads, defaulting to the configured count.
+
+    Returns:
+        np.ndarray: The rendered samples.
+    """
+    if isinstance(preset, dict):
+        preset = load_preset(preset)
+    if isinstance(preset, AdditivePreset):
+        return render_additive(preset, sample_rate, duration, workers=workers)
+    return render_subtractive(preset, sample_rate or DEFAULT_SAMPLE_RATE, 1.0 if duration is None else duration, workers=workers)
+
+
+def render_blocks(preset, sample_rate=None, duration=None, block_size=1 << 16):
+    """
+    Render any preset as a sequence of blocks, with the same defaults as render().
+
+    Subtractive presets stream from the render plan and additive presets from
+    additive_blocks(), so memory stays at a few blocks however long the
+    render is.
+
+    Yields:
+        np.ndarray: Blocks of at most block_size samples. A block may be
+            reused for the next one, so copy it to keep it.
+    """
+    if isinstance(preset, dict):
+        preset = load_preset(preset)
+    if isinstance(preset, AdditivePreset):
+        yield from additive_blocks(preset, sample_rate, duration, block_size)
+        return
+    plan = compile_subtractive(preset, sample_rate or DEFAULT_SAMPLE_RATE, 1.0 if duration is None else duration)
+    yield from plan.blocks(block_size)
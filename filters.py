@@ -0,0 +1,300 @@
+import itertools
+import numpy as np
+from functools import lru_cache, reduce
+
+from convolution import DEFAULT_BLOCK_SIZE, PartitionedConvolver, partition_kernel
+from kernels import time_varying_sosfilt
+
+
+# Second-order Butterworth types, fused into one SOS cascade
+IIR_FILTER_TYPES = ["Low-pass", "High-pass", "Band-pass", "Band-reject"]
+# Linear-phase low-pass types, merged into one kernel and applied by FFT convolution
+FIR_FILTER_TYPES = ["Linear-phase FIR"]
+FILTER_TYPES = IIR_FILTER_TYPES + FIR_FILTER_TYPES
+
+FIR_ATTENUATION = 80.0  # Stopband attenuation of the FIR designs, in dB
+FIR_MIN_TRANSITION = 10.0  # Narrowest FIR transition band, in Hz; about 16,000 taps at 32768 Hz
+
+
+def control_blocks(position, num_samples, block_size):
+    """
+    Split a block into cells of a control-rate grid anchored at sample 0.
+
+    Time-varying processors update their coefficients once per cell. Anchoring
+    the grid to the absolute stream position keeps the output independent of
+    how a caller splits the signal into blocks.
+
+    Returns:
+        tuple: (first, starts) where first is the number of leading samples
+            that finish the cell left over from the previous block, and starts
+            holds the index of each new cell in this block.
+    """
+    first = -position % block_size
+    return min(first, num_samples), np.arange(first, num_samples, block_size)
+
+
+@lru_cache(maxsize=256)
+def design_sos(filter_type, cutoff, resonance, sample_rate):
+    """
+    Design the second-order sections for one filter.
+
+    Designs are cached per (type, cutoff, resonance, sample_rate), so redrawing
+    or re-rendering with unchanged settings never calls butter() again. The
+    returned array is shared between callers and is therefore read-only.
+    """
+    # scipy.signal takes over a second to import, several times longer than
+    # NumPy, so it is only loaded once something is actually filtered
+    from scipy.signal import butter
+
+    nyquist = 0.5 * sample_rate
+
+    if filter_type in ("Low-pass", "High-pass"):
+        normal_cutoff = np.clip(cutoff / nyquist, 1e-4, 0.99)
+        btype = "low" if filter_type == "Low-pass" else "high"
+        sos = butter(N=2, Wn=normal_cutoff, btype=btype, output="sos")
+    elif filter_type in ("Band-pass", "Band-reject"):
+        low = max(0.01, (cutoff - resonance) / nyquist)
+        high = min(0.99, (cutoff + resonance) / nyquist)
+        if low >= high:
+            low = high * 0.5  # Keep the band edges ordered near the bottom of the range
+        btype = "band" if filter_type == "Band-pass" else "bandstop"
+        sos = butter(N=2, Wn=[low, high], btype=btype, output="sos")
+    else:
+        raise ValueError(f"Unknown filter type '{filter_type}'")
+
+    sos.flags.writeable = False
+    return sos
+
+
+@lru_cache(maxsize=64)
+def design_fir(cutoff, resonance, sample_rate):
+    """
+    Design a linear-phase low-pass FIR with a Kaiser window.
+
+    The resonance sets the steepness: the transition band is cutoff / (2 *
+    resonance) wide, so raising it makes the filter longer and sharper. The
+    length is always odd, so the group delay is a whole number of samples.
+    Designs are cached like design_sos(), and the taps are read-only.
+    """
+    from scipy.signal import firwin, kaiserord
+
+    nyquist = 0.5 * sample_rate
+    cutoff = float(np.clip(cutoff, 1e-4 * nyquist, 0.99 * nyquist))
+    width = min(max(FIR_MIN_TRANSITION, cutoff / (2 * max(resonance, 0.1))), cutoff, nyquist - cutoff)
+    num_taps, beta = kaiserord(FIR_ATTENUATION, width / nyquist)
+    taps = firwin(num_taps | 1, cutoff, window=("kaiser", beta), fs=sample_rate)
+    taps.flags.writeable = False
+    return taps
+
+
+@lru_cache(maxsize=32)
+def fir_spectra(settings, sample_rate, block_size, dtype):
+    """
+    Get the partition spectra of a chain of FIR filters, merged into one kernel.
+
+    Args:
+        settings (tuple): (cutoff, resonance) pairs.
+        dtype (str): Name of the sample dtype.
+
+    Returns:
+        tuple: (spectra, kernel_length)
+    """
+    kernel = reduce(np.convolve, [design_fir(cutoff, resonance, sample_rate) for cutoff, resonance in settings])
+    return partition_kernel(kernel, block_size, dtype), len(kernel)
+
+
+class FIRFilter:
+    """
+    A chain of linear-phase FIR filters applied by partitioned FFT convolution.
+
+    process() returns the input delayed by `latency` samples, one convolver
+    partition plus the kernel's group delay; flush() returns the rest.
+    """
+
+    def __init__(self, settings, sample_rate, block_size=DEFAULT_BLOCK_SIZE, dtype=float):
+        """
+        Args:
+            settings (tuple): (cutoff, resonance) pairs, one per filter.
+            sample_rate (int): The sample rate the chain runs at.
+            block_size (int): Partition size of the convolver, in samples.
+            dtype: Sample dtype of the output.
+        """
+        spectra, length = fir_spectra(tuple(settings), sample_rate, block_size, np.dtype(dtype).name)
+        self.convolver = PartitionedConvolver(spectra, block_size, dtype)
+        self.latency = block_size + (length - 1) // 2
+
+    def reset(self):
+        """Clear the convolver state."""
+        self.convolver.reset()
+
+    def process(self, block):
+        """Filter one block, returning the output `latency` samples behind."""
+        return self.convolver.process(block)
+
+    def flush(self):
+        """Get the last `latency` samples still held in the convolver."""
+        return self.process(np.zeros(self.latency, dtype=self.convolver.dtype))
+
+
+class SOSFilter:
+    """
+    A stateful cascade of second-order sections processed block by block.
+
+    The coefficients and state stay in float64 whatever the sample dtype:
+    poles close to the unit circle (low cutoffs, high resonance) amplify
+    rounding in the recursion, and in float32 that costs 40 dB or more of
+    accuracy. Only the output is converted to the sample dtype.
+    """
+
+    def __init__(self, sos, dtype=float):
+        self.sos = np.array(sos, dtype=float).reshape(-1, 6)
+        self.dtype = np.dtype(dtype)
+        self.reset()
+
+    def reset(self):
+        """Clear the filter state so the next block starts from silence."""
+        self.zi = np.zeros((self.sos.shape[0], 2))
+
+    def process(self, block):
+        """Filter one block, carrying the state over to the next call."""
+        if not len(self.sos):
+            return block
+        from scipy.signal import sosfilt
+        output, self.zi = sosfilt(self.sos, block, zi=self.zi)
+        return output.astype(self.dtype, copy=False)
+
+
+@lru_cache(maxsize=32)
+def coefficient_table(filter_type, resonance, sample_rate, size=256):
+    """Get the (cached) cutoff lookup table for a modulated filter."""
+    return CoefficientTable(filter_type, resonance, sample_rate, size)
+
+
+class CoefficientTable:
+    """
+    SOS coefficients for one filter type tabulated over log-spaced cutoffs.
+
+    Looking up a cutoff interpolates between the two nearest entries, so a
+    modulated filter never has to call butter() while it is running.
+    """
+
+    def __init__(self, filter_type, resonance, sample_rate, size=256):
+        self.min_cutoff = 20.0
+        self.max_cutoff = 0.95 * 0.5 * sample_rate
+        self.size = size
+        self.cutoffs = np.geomspace(self.min_cutoff, self.max_cutoff, size)
+        self.log_min = np.log(self.min_cutoff)
+        self.log_step = np.log(self.max_cutoff / self.min_cutoff) / (size - 1)
+
+        # Bypass the design_sos cache so building a table doesn't flush it
+        table = np.stack([
+            design_sos.__wrapped__(filter_type, float(cutoff), resonance, sample_rate)
+            for cutoff in self.cutoffs
+        ])
+        self.coefficients = self.align_sections(table)
+
+    @staticmethod
+    def align_sections(table):
+        """
+        Reorder sections so neighbouring entries can be interpolated.
+
+        butter() may pair zeros and poles into sections differently from one
+        cutoff to the next. A cascade is a product, so numerators and
+        denominators can be permuted independently without changing the
+        response; each entry is matched to the previous one, with the overall
+        gain kept in the first section.
+        """
+        table = table.copy()
+        gain = np.prod(table[:, :, 0], axis=1)
+        table[:, :, :3] /= table[:, :, :1]
+
+        orders = list(itertools.permutations(range(table.shape[1])))
+        for i in range(1, len(table)):
+            for part in (slice(0, 3), slice(3, 6)):
+                best = min(orders, key=lambda order: np.abs(table[i, list(order), part] - table[i - 1, :, part]).sum())
+                table[i, :, part] = table[i, list(best), part]
+
+        table[:, 0, :3] *= gain[:, None]
+        return table
+
+    def lookup(self, cutoffs):
+        """Interpolate the coefficients for an array of cutoffs (Hz)."""
+        position = (np.log(np.clip(cutoffs, self.min_cutoff, self.max_cutoff)) - self.log_min) / self.log_step
+        index = np.minimum(position.astype(int), self.size - 2)
+        frac = (position - index)[:, None, None]
+        return self.coefficients[index] * (1 - frac) + self.coefficients[index + 1] * frac
+
+
+class ModulatedFilter:
+    """
+    A filter whose cutoff follows a modulation buffer, updated every `block_size` samples.
+
+    Like SOSFilter, the coefficients and state stay in float64 and only the
+    output is at the sample dtype.
+    """
+
+    def __init__(self, filter_type, cutoff, resonance, sample_rate, block_size=64, dtype=float):
+        self.cutoff = float(cutoff)
+        self.dtype = np.dtype(dtype)
+        # Only the band filters use the resonance, so don't build a table per value for the others
+        if filter_type not in ("Band-pass", "Band-reject"):
+            resonance = 0.0
+        self.table = coefficient_table(filter_type, float(resonance), sample_rate)
+        self.block_size = block_size
+        self.reset()
+
+    def reset(self):
+        """Clear the filter state and restart the coefficient update grid."""
+        self.zi = np.zeros((self.table.coefficients.shape[1], 2))
+        self.sos = self.table.lookup(np.array([self.cutoff]))[0]
+        self.position = 0
+
+    def process(self, block, modulation):
+        """
+        Filter one block.
+
+        Args:
+            block (np.ndarray): The input samples.
+            modulation (np.ndarray): Per-sample LFO value for the cutoff; the
+                cutoff swings ±50% around its base value, like the oscillator
+                frequency does.
+        """
+        num_samples = len(block)
+        output = np.empty(num_samples, dtype=self.dtype)
+
+        first, starts = control_blocks(self.position, num_samples, self.block_size)
+        cells = self.table.lookup(self.cutoff * (1 + modulation[starts] * 0.5))
+
+        # A block that starts mid-way through a grid cell finishes it with the
+        # previous coefficients
+        if first:
+            cells = np.concatenate((self.sos[None], cells))
+            starts = np.concatenate(([0], starts))
+
+        time_varying_sosfilt(block, cells, starts, self.zi, output)
+        if len(cells):
+            self.sos = cells[-1]
+        self.position += num_samples
+        return output
+
+
+class ModulatedFilterChain:
+    """A chain of filters that all follow the same cutoff modulation."""
+
+    def __init__(self, settings, sample_rate, block_size=64, dtype=float):
+        self.filters = [
+            ModulatedFilter(filter_type, cutoff, resonance, sample_rate, block_size, dtype)
+            for filter_type, cutoff, resonance in settings
+            if filter_type in IIR_FILTER_TYPES
+        ]
+
+    def reset(self):
+        """Clear the state of every filter in the chain."""
+        for filter_ in self.filters:
+            filter_.reset()
+
+    def process(self, block, modulation):
+        """Filter one block through every filter in turn."""
+        for filter_ in self.filters:
+            block = filter_.process(block, modulation)
+        return block
@@ -0,0 +1,179 @@
+"""
+Kernels for sample-recursive DSP.
+
+Feedback delays, time-varying filter cascades and phase-modulation loops
+depend on the previous output sample, which NumPy can't vectorize well. When
+Numba is installed the per-sample loops below are JIT-compiled; otherwise
+each kernel falls back to a NumPy/SciPy implementation of the same
+recursion, so results are identical either way. The phase-modulation loop
+has no such form and runs as plain Python instead, which is much slower.
+Set SYNTH_KERNELS=numpy to force the fallback.
+"""
+import math
+import os
+import importlib.metadata
+import importlib.util
+import numpy as np
+
+
+# Importing Numba costs more than importing NumPy, so only check that it is
+# installed here and import it the first time a kernel runs
+if importlib.util.find_spec("numba") is not None and os.environ.get("SYNTH_KERNELS", "numba") != "numpy":
+    BACKEND = "numba"
+else:
+    BACKEND = "numpy"
+
+_compiled = {}
+
+
+def kernel_info():
+    """Describe the kernel backend in use, for diagnostics."""
+    return {
+        "backend": BACKEND,
+        "numba_version": importlib.metadata.version("numba") if BACKEND == "numba" else None,
+    }
+
+
+def compiled(loop):
+    """Get the JIT-compiled version of a kernel loop, compiling (or loading it from the cache) on first use."""
+    if loop not in _compiled:
+        import numba
+        _compiled[loop] = numba.njit(cache=True)(loop)
+    return _compiled[loop]
+
+
+def _time_varying_sosfilt_loop(x, cells, starts, zi, out):
+    """Direct-form II transposed SOS cascade, switching coefficients at each cell start."""
+    num_cells, num_sections = cells.shape[0], cells.shape[1]
+    for cell in range(num_cells):
+        stop = starts[cell + 1] if cell + 1 < num_cells else x.shape[0]
+        for i in range(starts[cell], stop):
+            value = x[i]
+            for section in range(num_sections):
+                b0, b1, b2 = cells[cell, section, 0], cells[cell, section, 1], cells[cell, section, 2]
+                a1, a2 = cells[cell, section, 4], cells[cell, section, 5]
+                output = b0 * value + zi[section, 0]
+                zi[section, 0] = b1 * value - a1 * output + zi[section, 1]
+                zi[section, 1] = b2 * value - a2 * output
+                value = output
+            out[i] = value
+
+
+def _feedback_delay_loop(line, read_positions, offset, feedback, delayed):
+    """Read a delay line at fractional positions, feeding each read back in before the next."""
+    for i in range(read_positions.shape[0]):
+        index = int(read_positions[i])
+        frac = read_positions[i] - index
+        value = line[index] * (1 - frac) + line[index + 1] * frac
+        delayed[i] = value
+        line[offset + i] += feedback * value
+
+
+def _phase_feedback_loop(phases, shapes, forward, feedback, state, out):
+    """Shape phase-modulated operators sample by sample, feedback edges reading the previous sample."""
+    num_operators, num_samples = phases.shape
+    for i in range(num_samples):
+        for target in range(num_operators):
+            phase = phases[target, i]
+            for source in range(num_operators):
+                phase += feedback[source, target] * state[source]
+                if source < target:
+                    phase += forward[source, target] * out[source, i]
+
+            shape = shapes[target]
+            if shape == 0 or shape == 1:
+                value = math.sin(phase)
+                if shape == 1:
+                    value = 1.0 if value > 0 else (-1.0 if value < 0 else 0.0)
+            elif shape == 2 or shape == 3:
+                value = 2.0 * ((phase / (2 * math.pi)) % 1.0) - 1.0
+                if shape == 3:
+                    value = 2.0 * abs(value)
+            else:
+                value = 0.0
+            out[target, i] = value
+
+        for target in range(num_operators):
+            state[target] = out[target, i]
+
+
+def time_varying_sosfilt(x, cells, starts, zi, out):
+    """
+    Filter x through SOS cascades whose coefficients change over time.
+
+    Args:
+        x (np.ndarray): The input samples.
+        cells (np.ndarray): (num_cells, num_sections, 6) normalised SOS coefficients.
+        starts (np.ndarray): Sample index at which each cell takes over; the
+            first must be 0.
+        zi (np.ndarray): (num_sections, 2) filter state, updated in place.
+        out (np.ndarray): Output buffer, the same length as x.
+    """
+    if BACKEND == "numba":
+        compiled(_time_varying_sosfilt_loop)(x, cells, starts, zi, out)
+        return out
+
+    from scipy.signal import sosfilt  # Deferred like every scipy.signal import; see filters.py
+
+    stops = np.append(starts[1:], len(x))
+    for sos, start, stop in zip(cells, starts, stops):
+        out[start:stop], zi[:] = sosfilt(sos, x[start:stop], zi=zi)
+    return out
+
+
+def feedback_delay(line, read_positions, offset, feedback, min_delay, delayed):
+    """
+    Read a delay line with feedback into it.
+
+    Each read at read_positions[i] is written to delayed[i] and fed back into
+    line[offset + i], so later reads see the feedback.
+
+    Args:
+        line (np.ndarray): Delay-line history followed by the input block, updated in place.
+        read_positions (np.ndarray): Fractional read index for each sample of the block.
+        offset (int): Index in line of the first sample of the block.
+        feedback (float): Feedback gain.
+        min_delay (float): Shortest delay in samples (at least 2) covered by read_positions.
+        delayed (np.ndarray): Output buffer for the delayed signal.
+    """
+    if BACKEND == "numba":
+        compiled(_feedback_delay_loop)(line, read_positions, offset, feedback, delayed)
+        return delayed
+
+    # Walk the block in chunks no longer than the shortest delay, so every
+    # read in a chunk only touches samples that have already been written
+    chunk = int(min_delay) - 1
+    for start in range(0, len(read_positions), chunk):
+        stop = min(start + chunk, len(read_positions))
+        positions = read_positions[start:stop]
+        index = positions.astype(int)
+        frac = positions - index
+        delayed[start:stop] = line[index] * (1 - frac) + line[index + 1] * frac
+        line[offset + start:offset + stop] += feedback * delayed[start:stop]
+    return delayed
+
+
+def phase_feedback(phases, shapes, forward, feedback, state, out):
+    """
+    Evaluate a group of operators that phase-modulate each other in a loop.
+
+    Each operator's output is its waveform at its own phase plus the
+    modulation from the others: forward edges (from an earlier operator in
+    the group) use the same sample, feedback edges the previous one.
+
+    Args:
+        phases (np.ndarray): (operators, samples) accumulated phases in
+            radians, including any modulation from outside the group.
+        shapes (np.ndarray): Waveform code per operator: 0 sine, 1 square,
+            2 sawtooth, 3 triangle; anything else is silent.
+        forward (np.ndarray): (operators, operators) depths, [source, target],
+            for same-sample edges; only source < target is read.
+        feedback (np.ndarray): (operators, operators) depths for edges
+            delayed by one sample.
+        state (np.ndarray): Outputs at the previous sample, updated in place.
+        out (np.ndarray): (operators, samples) output buffer for the waveforms.
+    """
+    # The recursion has no vectorized form, so without Numba the same loop runs in Python
+    loop = compiled(_phase_feedback_loop) if BACKEND == "numba" else _phase_feedback_loop
+    loop(phases, shapes, forward, feedback, state, out)
+    return out
@@ -0,0 +1,116 @@
+"""
+Streaming look-ahead peak limiter.
+
+The limiter replaces whole-buffer normalization at the end of the render
+chain. Its output is delayed by a fixed look-ahead, which lets the gain ramp
+down before a peak arrives instead of clipping it; after the peak the gain
+holds for a while and then ramps back up. All of it is computed per block
+with a vectorized sliding max, so the limiter works in one streaming pass.
+"""
+import numpy as np
+
+
+def sliding_max(x, window):
+    """
+    Get the max of every run of `window` consecutive values in x.
+
+    Uses the van Herk/Gil-Werman method: running maxima forward and backward
+    within fixed chunks of the window length, so the cost doesn't depend on
+    the window.
+
+    Returns:
+        np.ndarray: len(x) - window + 1 values, the first for x[:window].
+    """
+    count = len(x) - window + 1
+    if count <= 0:
+        return np.empty(0)
+    padded = np.full(-(-len(x) // window) * window, -np.inf)
+    padded[:len(x)] = x
+    chunks = padded.reshape(-1, window)
+    prefix = np.maximum.accumulate(chunks, axis=1).ravel()
+    suffix = np.maximum.accumulate(chunks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.maximum(suffix[:count], prefix[window - 1:window - 1 + count])
+
+
+class Limiter:
+    """
+    Keeps the signal within a ceiling, delaying it by a fixed look-ahead.
+
+    The gain at each sample is the ceiling over the loudest sample between
+    `hold` seconds back and `lookahead` seconds ahead (capped at 1), averaged
+    over the look-ahead window. Every window in that average contains the
+    sample itself, so the gain never lets it exceed the ceiling, and the
+    average turns steps in the gain into ramps one look-ahead long.
+
+    Like the effects, the limiter has reset() and process(block, out=None)
+    and gives the same output whatever the block sizes. process() returns
+    the input delayed by `latency` samples; flush() returns the rest.
+    """
+
+    def __init__(self, sample_rate, ceiling=1.0, lookahead=0.005, hold=0.05, dtype=float):
+        """
+        Args:
+            sample_rate (int): Sample rate in Hz.
+            ceiling (float): Highest absolute output value.
+            lookahead (float): How early the gain starts ramping down, in seconds.
+            hold (float): How long the gain stays down after a peak, in seconds.
+            dtype: Sample dtype of the output.
+        """
+        self.ceiling = ceiling
+        self.dtype = np.dtype(dtype)
+        self.latency = max(1, int(round(lookahead * sample_rate)))
+        self.window = self.latency + max(0, int(round(hold * sample_rate))) + 1
+        # Input kept from earlier blocks: the peak window behind the output, and the look-ahead in front of it
+        self.history_size = self.window - 1 + self.latency
+        self.reset()
+
+    def reset(self):
+        """Empty the look-ahead and hold history."""
+        self.history = np.zeros(self.history_size, dtype=self.dtype)
+
+    def process(self, block, out=None):
+        """Limit one block, returning the input from `latency` samples earlier."""
+        num_samples = len(block)
+        line = np.concatenate((self.history, block))
+        self.history = line[num_samples:]
+
+        peaks = sliding_max(np.abs(line), self.window)
+        np.maximum(peaks, self.ceiling, out=peaks)
+        gains = np.divide(self.ceiling, peaks, out=peaks)
+
+        # Moving average over the look-ahead (latency + 1 values per output sample),
+        # summed in float64 so the running sum doesn't lose the small differences
+        sums = np.concatenate(([0.0], np.cumsum(gains, dtype=np.float64)))
+        gain = (sums[self.latency + 1:] - sums[:-self.latency - 1]) / (self.latency + 1)
+
+        output = np.empty(num_samples, dtype=self.dtype) if out is None else out
+        np.multiply(line[self.window - 1:self.window - 1 + num_samples], gain, out=output)
+        # The average can round a hair above the exact gain
+        return np.clip(output, -self.ceiling, self.ceiling, out=output)
+
+    def flush(self):
+        """Get the last `latency` samples still held in the look-ahead."""
+        return self.process(np.zeros(self.latency, dtype=self.dtype))
+
+
+def limit_blocks(limiter, blocks):
+    """
+    Run blocks through a limiter, removing its latency.
+
+    The first `latency` output samples (the limiter's silent history) are
+    dropped and the flushed tail is appended, so the output lines up with the
+    input and has the same length. Yields arrays owned by the caller.
+    """
+    skip = limiter.latency
+    for block in blocks:
+        output = limiter.process(block)
+        if skip:
+            dropped = min(skip, len(output))
+            output = output[dropped:]
+            skip -= dropped
+        if len(output):
+            yield output
+    # Anything not yet skipped was history, so only the rest of the tail is audio
+    tail = limiter.flush()[skip:]
+    if len(tail):
+        yield tail
@@ -9,6 +9,7 @@ from additive_synth import AdditiveSynth
 from subtractive_synth import SubtractiveSynth
 from login_system import LoginSystem
 from preset_manager import PresetManager, CommunityPresetManager
+from kernels import kernel_info
 
 
 class SynthApp(ctk.CTk):
@@ -144,5 +145,6 @@ class SynthApp(ctk.CTk):
 
 if __name__ == "__main__":
     print("start")
+    print(f"DSP kernel backend: {kernel_info()['backend']}")
     app = SynthApp()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+Oversampling for nonlinear effects.
+
+Wavefolding, bit crushing and ring modulation create partials far above the
+Nyquist frequency, which fold back down as aliasing. Oversampled runs one
+effect at 2, 4 or 8 times the sample rate between half-band up- and
+down-sampling filters, so the new partials are filtered out before the
+signal returns to the base rate. Only the wrapped effect runs at the higher
+rate.
+
+Each 2x stage is a half-band FIR split into its two polyphase branches.
+Every other tap of a half-band filter is zero except the centre one, so one
+branch is an ordinary FIR and the other is just a delay. Stages keep their
+input history between blocks, so the filters stream like any effect.
+
+The filters delay the signal by a fraction of a base-rate sample past 2x, so
+a few samples of extra delay at the oversampled rate round the latency up
+to whole base-rate samples, which the render plan then removes. Effects
+driven by their stream position start that position back by the
+up-sampling delay, so their modulation stays in phase with a 1x render.
+"""
+from functools import lru_cache
+import numpy as np
+
+
+OVERSAMPLING_FACTORS = (1, 2, 4, 8)
+
+# Half the number of nonzero taps in each branch: the stage next to the base
+# rate needs the sharpest filter, the inner stages only have to reject
+# content far above the audio band
+FIRST_STAGE_TAPS = 12
+INNER_STAGE_TAPS = 6
+
+
+@lru_cache(maxsize=8)
+def halfband_taps(half_length, beta=8.0):
+    """
+    Design the FIR branch of a Kaiser-windowed half-band lowpass.
+
+    The full filter has 4 * half_length - 1 taps and cuts off at a quarter of
+    its sample rate. Its centre tap is 0.5 and the other odd taps are zero;
+    this returns the 2 * half_length even taps, scaled for unity DC gain.
+    """
+    length = 4 * half_length - 1
+    offsets = np.arange(0, length, 2) - (length - 1) // 2
+    taps = 0.5 * np.sinc(offsets / 2) * np.kaiser(length, beta)[::2]
+    taps *= 0.5 / taps.sum()
+    taps.flags.writeable = False
+    return taps
+
+
+class HalfbandUpsampler:
+    """Doubles the sample rate of a stream."""
+
+    def __init__(self, half_length, dtype=float):
+        self.half_length = half_length
+        self.taps = halfband_taps(half_length).astype(dtype)
+        self.dtype = np.dtype(dtype)
+        self.reset()
+
+    def reset(self):
+        """Clear the input history."""
+        self.history = np.zeros(2 * self.half_length - 1, dtype=self.dtype)
+
+    def process(self, block):
+        """Upsample one block, returning twice as many samples."""
+        num_samples = len(block)
+        line = np.concatenate((self.history, block))
+        self.history = line[num_samples:]
+
+        output = np.empty(2 * num_samples, dtype=self.dtype)
+        # Zero-stuffing halves the level, so both branches have a gain of 2
+        output[0::2] = np.convolve(line, self.taps, "valid")
+        output[0::2] *= 2
+        output[1::2] = line[self.half_length:self.half_length + num_samples]  # 2 * the 0.5 centre tap
+        return output
+
+
+class HalfbandDownsampler:
+    """Halves the sample rate of a stream; blocks must have an even length."""
+
+    def __init__(self, half_length, dtype=float):
+        self.half_length = half_length
+        self.taps = halfband_taps(half_length).astype(dtype)
+        self.dtype = np.dtype(dtype)
+        self.reset()
+
+    def reset(self):
+        """Clear the input history of both branches."""
+        self.even_history = np.zeros(2 * self.half_length - 1, dtype=self.dtype)
+        self.odd_history = np.zeros(self.half_length, dtype=self.dtype)
+
+    def process(self, block):
+        """Downsample one block, returning half as many samples."""
+        num_samples = len(block) // 2
+        even = np.concatenate((self.even_history, block[0::2]))
+        odd = np.concatenate((self.odd_history, block[1::2]))
+        self.even_history = even[num_samples:]
+        self.odd_history = odd[num_samples:]
+
+        output = np.convolve(even, self.taps, "valid")
+        output += 0.5 * odd[:num_samples]
+        return output
+
+
+class Oversampled:
+    """
+    Runs an effect at `factor` times the sample rate.
+
+    The effect must have been created for the oversampled rate. Like the
+    effects, this has reset() and process(block, out=None). The output is
+    delayed by `latency` (a whole number of) samples at the base rate.
+    """
+
+    def __init__(self, effect, factor, dtype=float):
+        """
+        Args:
+            effect: The effect processor, running at factor * the base rate.
+            factor (int): One of OVERSAMPLING_FACTORS.
+            dtype: Sample dtype of the filters.
+        """
+        if factor not in OVERSAMPLING_FACTORS:
+            raise ValueError(f"Unsupported oversampling factor: {factor}")
+        self.effect = effect
+        self.factor = factor
+        stages = [FIRST_STAGE_TAPS] + [INNER_STAGE_TAPS] * (int(np.log2(factor)) - 1)
+        self.upsamplers = [HalfbandUpsampler(half_length, dtype) for half_length in stages]
+        self.downsamplers = [HalfbandDownsampler(half_length, dtype) for half_length in stages]
+        self.dtype = np.dtype(dtype)
+        # Each stage's up and down filters each delay by 2 * half_length - 1 samples at its output rate,
+        # so the effect sees its input input_delay samples late, and the output is filter_delay samples late
+        self.input_delay = sum((2 * half_length - 1) * factor // 2 ** (stage + 1) for stage, half_length in enumerate(stages))
+        filter_delay = 2 * self.input_delay
+        self.padding = -filter_delay % factor
+        self.latency = (filter_delay + self.padding) // factor
+        self.reset()
+
+    def reset(self):
+        """Reset the effect and clear the filter and padding history."""
+        self.effect.reset()
+        # Start a time-driven effect's clock input_delay samples early, so its
+        # modulator phase and hold grid line up with the same effect at 1x
+        if hasattr(self.effect, "position"):
+            self.effect.position = -self.input_delay
+        for stage in self.upsamplers + self.downsamplers:
+            stage.reset()
+        self.pad_history = np.zeros(self.padding, dtype=self.dtype)
+
+    def process(self, block, out=None):
+        """Process one block through the upsampling filters, the effect and the downsampling filters."""
+        signal = block
+        for stage in self.upsamplers:
+            signal = stage.process(signal)
+        signal = self.effect.process(signal, out=signal)
+        if self.padding:
+            line = np.concatenate((self.pad_history, signal))
+            signal, self.pad_history = line[:len(signal)], line[len(signal):]
+        for stage in reversed(self.downsamplers):
+            signal = stage.process(signal)
+
+        if out is None:
+            return signal
+        np.copyto(out, signal)
+        return out
@@ -0,0 +1,70 @@
+"""
+Thread pool for splitting renders across cores.
+
+NumPy releases the GIL inside its ufuncs, so independent slices of a render
+(time segments, harmonic groups) can run on several threads at once. Jobs
+shorter than MIN_PARALLEL_SAMPLES run serially on the calling thread, where
+handing them to the pool would cost more than it saves.
+
+The worker count defaults to the number of CPUs; set SYNTH_THREADS or call
+set_workers() to change it, and use 1 to disable threading.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+MIN_PARALLEL_SAMPLES = 1 << 16
+
+_workers = int(os.environ.get("SYNTH_THREADS", 0)) or os.cpu_count() or 1
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def set_workers(workers):
+    """Set the number of render threads (1 renders serially)."""
+    global _workers, _pool
+    with _pool_lock:
+        _workers = max(1, int(workers))
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def get_workers(workers=None):
+    """Resolve a worker count, defaulting to the configured one."""
+    return max(1, int(workers)) if workers else _workers
+
+
+def get_pool():
+    """Get the shared thread pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="render")
+        return _pool
+
+
+def segments(num_samples, workers=None, min_samples=MIN_PARALLEL_SAMPLES):
+    """
+    Split a render into (start, stop) segments, one per worker.
+
+    Returns a single segment when threading isn't worth it.
+    """
+    parts = min(get_workers(workers), num_samples // max(1, min_samples))
+    if parts <= 1:
+        return [(0, num_samples)]
+    bounds = [num_samples * i // parts for i in range(parts + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def run(function, *iterables):
+    """
+    Call function over the iterables on the pool and return the results in order.
+
+    A single call runs on the calling thread.
+    """
+    args = list(zip(*iterables))
+    if len(args) <= 1:
+        return [function(*arg) for arg in args]
+    return list(get_pool().map(function, *zip(*args)))
@@ -0,0 +1,44 @@
+"""
+Sample precision of the render pipeline.
+
+Audio buffers are float32 by default: half the memory and bandwidth of
+float64, and still far finer than the 16- or 24-bit files the audio ends up
+in. float64 is kept as a reference mode; set SYNTH_PRECISION=float64 or call
+set_precision("float64") before rendering.
+
+Only the audio itself follows the precision. Clocks, oscillator phases and
+filter design stay in float64 either way, because float32 can't count past
+2**24 samples (about 8.5 minutes at 32768 Hz) exactly.
+"""
+import os
+import numpy as np
+
+
+PRECISIONS = ("float32", "float64")
+
+_precision = os.environ.get("SYNTH_PRECISION", "float32")
+if _precision not in PRECISIONS:
+    _precision = "float32"
+
+
+def set_precision(precision):
+    """Set the sample precision for renders started after this call ("float32" or "float64")."""
+    global _precision
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    _precision = precision
+
+
+def get_precision():
+    """Get the name of the current sample precision."""
+    return _precision
+
+
+def get_dtype():
+    """Get the dtype of audio buffers at the current precision."""
+    return np.dtype(_precision)
+
+
+def complex_dtype(dtype=None):
+    """Get the complex dtype matching a real sample dtype (complex64 for float32)."""
+    return np.result_type(get_dtype() if dtype is None else dtype, np.complex64)
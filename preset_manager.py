@@ -4,8 +4,11 @@ import customtkinter as ctk
 from tkinter import filedialog, messagebox
 from datetime import datetime
 from utils import MergeSort, PresetExporterImporter
-import scipy.io.wavfile as wavfile
 from utils import ScrollableFrame
+from preset_store import PresetStore, migrate
+from render_cache import get_cache
+from batch_render import start_batch_render
+from wav_export import SAMPLE_FORMATS, export_wav
 
 
 class PresetManager:
@@ -24,6 +27,7 @@ class PresetManager:
         cursor = connection.cursor()
 
         try:
+            migrate(connection)
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             # Check if the preset already exists
@@ -39,22 +43,22 @@ class PresetManager:
                     # Update existing preset
                     cursor.execute("""
                         UPDATE AdditivePresets
-                        SET base_frequency = ?, sample_rate = ?, duration = ?, volume = ?, tone = ?, num_harmonics = ?, attack = ?, decay = ?, sustain = ?, release = ?, last_updated = ?
+                        SET base_frequency = ?, sample_rate = ?, duration = ?, volume = ?, tone = ?, num_harmonics = ?, rolloff = ?, attack = ?, decay = ?, sustain = ?, release = ?, last_updated = ?
                         WHERE Uid = ? AND name = ?
                     """, (
                         preset_data["base_frequency"], preset_data["sample_rate"], preset_data["duration"],
-                        preset_data["volume"], preset_data["tone"], preset_data["num_harmonics"], preset_data["adsr"]["attack"],
+                        preset_data["volume"], preset_data["tone"], preset_data["num_harmonics"], preset_data.get("rolloff", 1.0), preset_data["adsr"]["attack"],
                         preset_data["adsr"]["decay"], preset_data["adsr"]["sustain"], preset_data["adsr"]["release"], current_time,
                         self.Uid, preset_name
                     ))
                 else:
                     # Insert new preset
                     cursor.execute("""
-                        INSERT INTO AdditivePresets (Uid, name, base_frequency, sample_rate, duration, volume, tone, num_harmonics, attack, decay, sustain, release, created_at, last_updated)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        INSERT INTO AdditivePresets (Uid, name, base_frequency, sample_rate, duration, volume, tone, num_harmonics, rolloff, attack, decay, sustain, release, created_at, last_updated)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """, (
                         self.Uid, preset_name, preset_data["base_frequency"], preset_data["sample_rate"], preset_data["duration"],
-                        preset_data["volume"], preset_data["tone"], preset_data["num_harmonics"], preset_data["adsr"]["attack"],
+                        preset_data["volume"], preset_data["tone"], preset_data["num_harmonics"], preset_data.get("rolloff", 1.0), preset_data["adsr"]["attack"],
                         preset_data["adsr"]["decay"], preset_data["adsr"]["sustain"], preset_data["adsr"]["release"], current_time, current_time
                     ))
 
@@ -71,11 +75,12 @@ class PresetManager:
                     cursor.execute("SELECT Sid FROM SubtractivePresets WHERE Uid = ? AND name = ?", (self.Uid, preset_name))
                     Sid = cursor.fetchone()[0]
 
-                    # Delete existing components (oscillators, filters, effects, LFOs)
+                    # Delete existing components (oscillators, filters, effects, LFOs, FM matrix)
                     cursor.execute("DELETE FROM SubtractivePresetOscillators WHERE Sid = ?", (Sid,))
                     cursor.execute("DELETE FROM SubtractivePresetFilters WHERE Sid = ?", (Sid,))
                     cursor.execute("DELETE FROM SubtractivePresetEffects WHERE Sid = ?", (Sid,))
                     cursor.execute("DELETE FROM SubtractivePresetLFOs WHERE Sid = ?", (Sid,))
+                    cursor.execute("DELETE FROM SubtractivePresetFM WHERE Sid = ?", (Sid,))
 
                     # Save updated components
                     self.save_subtractive_components(cursor, Sid, preset_data)
@@ -105,13 +110,14 @@ class PresetManager:
 
 
     def save_subtractive_components(self, cursor, Sid, preset_data):
-        """Save the oscillators, filters, effects, and LFOs for a subtractive synthesizer preset."""
+        """Save the oscillators, filters, effects, LFOs, and FM matrix for a subtractive synthesizer preset."""
         # Save oscillators
         for osc in preset_data.get("oscillators", []):
             cursor.execute("""
-                INSERT INTO SubtractivePresetOscillators (Sid, type, frequency, amplitude)
-                VALUES (?, ?, ?, ?)
-            """, (Sid, osc["type"], osc["frequency"], osc["amplitude"]))
+                INSERT INTO SubtractivePresetOscillators (Sid, type, frequency, amplitude, unison, detune, spread)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (Sid, osc["type"], osc["frequency"], osc["amplitude"],
+                  int(osc.get("unison", 1)), osc.get("detune", 0.0), osc.get("spread", 0.0)))
 
         # Save filters
         for filt in preset_data.get("filters", []):
@@ -124,9 +130,9 @@ class PresetManager:
         for effect in preset_data.get("effects", []):
             # Insert the effect into the Effects table if it doesn't exist
             cursor.execute("""
-                INSERT OR IGNORE INTO Effects (name)
-                VALUES (?)
-            """, (effect["type"],))
+                INSERT OR IGNORE INTO Effects (name, description)
+                VALUES (?, ?)
+            """, (effect["type"], effect["type"]))
 
             # Get the effect ID
             cursor.execute("SELECT Eid FROM Effects WHERE name = ?", (effect["type"],))
@@ -144,6 +150,13 @@ class PresetManager:
                 INSERT INTO SubtractivePresetLFOs (Sid, shape, frequency, depth, target)
                 VALUES (?, ?, ?, ?, ?)
             """, (Sid, lfo["shape"], lfo["frequency"], lfo["depth"], lfo["target"]))             
+
+        # Save the FM matrix
+        for edge in preset_data.get("fm", []):
+            cursor.execute("""
+                INSERT INTO SubtractivePresetFM (Sid, source, target, depth)
+                VALUES (?, ?, ?, ?)
+            """, (Sid, int(edge["source"]), int(edge["target"]), edge["depth"]))
     def list_presets(self, sort_by="name"):
         """Retrieve a sorted list of all presets for the user."""
         connection = sqlite3.connect(self.db_path)
@@ -238,6 +251,14 @@ class PresetManager:
         save_wav_button = ctk.CTkButton(button_frame, text="Save as .WAV", command=self.save_as_wav)
         save_wav_button.pack(side="left", padx=5)
 
+        render_all_button = ctk.CTkButton(button_frame, text="Render All to .WAV", command=self.render_all_to_wav)
+        render_all_button.pack(side="left", padx=5)
+
+        # Sample format for both WAV exports
+        self.wav_format_var = ctk.StringVar(value="float32")
+        wav_format_menu = ctk.CTkComboBox(button_frame, values=list(SAMPLE_FORMATS), variable=self.wav_format_var, width=100)
+        wav_format_menu.pack(side="left", padx=5)
+
         # Add Upload to Community Library button
         upload_button = ctk.CTkButton(button_frame, text="Upload to Community Library", command=self.upload_to_community_library)
         upload_button.pack(side="left", padx=5)
@@ -339,93 +360,8 @@ class PresetManager:
 
     def load_preset_data(self, preset_name, preset_type):
         """Retrieve preset data from the database."""
-        connection = sqlite3.connect(self.db_path)
-        cursor = connection.cursor()
+        return PresetStore(self.db_path, self.Uid).load_preset_data(preset_name, preset_type)
 
-        if preset_type == "Additive":
-            cursor.execute("""
-                SELECT base_frequency, sample_rate, duration, volume, tone, num_harmonics, attack, decay, sustain, release
-                FROM AdditivePresets
-                WHERE Uid = ? AND name = ?
-            """, (self.Uid, preset_name))
-            result = cursor.fetchone()
-
-            if not result:
-                print(f"Error: Additive Preset '{preset_name}' not found.")
-                return None
-
-            # Extract the data
-            base_frequency, sample_rate, duration, volume, tone, num_harmonics, attack, decay, sustain, release = result
-
-            return {
-                "type": preset_type,
-                "name": preset_name,
-                "base_frequency": base_frequency,
-                "sample_rate": sample_rate,
-                "duration": duration,
-                "volume": volume,
-                "tone": tone,
-                "num_harmonics": num_harmonics,
-                "adsr": {
-                    "attack": attack,
-                    "decay": decay,
-                    "sustain": sustain,
-                    "release": release,
-                },
-            }
-
-        elif preset_type == "Subtractive":
-            cursor.execute("""
-                SELECT Sid, volume FROM SubtractivePresets 
-                WHERE Uid = ? AND name = ?
-            """, (self.Uid, preset_name))
-            preset = cursor.fetchone()
-            
-            if not preset:
-                print(f"Error: Subtractive Preset '{preset_name}' not found.")
-                return None
-            
-            Sid, volume = preset
-
-            # Retrieve filters
-            cursor.execute("""
-                SELECT filter_type, cutoff_frequency, resonance FROM SubtractivePresetFilters 
-                WHERE Sid = ?
-            """, (Sid,))
-            filters = [{"type": row[0], "cutoff": row[1], "resonance": row[2]} for row in cursor.fetchall()]
-
-            # Retrieve oscillators
-            cursor.execute("""
-                SELECT type, frequency, amplitude FROM SubtractivePresetOscillators 
-                WHERE Sid = ?
-            """, (Sid,))
-            oscillators = [{"type": row[0], "frequency": row[1], "amplitude": row[2]} for row in cursor.fetchall()]
-
-            # Retrieve effects
-            cursor.execute("""
-                SELECT e.name, spe.parameters FROM SubtractivePresetEffects spe
-                JOIN Effects e ON spe.Eid = e.Eid
-                WHERE spe.Sid = ?
-            """, (Sid,))
-            effects = [{"type": row[0], "params": json.loads(row[1])} for row in cursor.fetchall()]
-
-            # Retrieve LFOs (fix: ensure correct SQL column names)
-            cursor.execute("""
-                SELECT shape, frequency, depth, target FROM SubtractivePresetLFOs
-                WHERE Sid = ?
-            """, (Sid,))
-            lfos = [{"shape": row[0], "frequency": row[1], "depth": row[2], "target": row[3]} for row in cursor.fetchall()]
-
-            return {
-                "type": preset_type,
-                "name": preset_name,
-                "volume": volume,
-                "oscillators": oscillators,
-                "filters": filters,
-                "effects": effects,
-                "lfos": lfos  # Fix: Ensure LFOs are retrieved
-            }
-            
     def export_preset(self):
         """Export the selected preset to a text file."""
         selected_preset_name = self.selected_preset_var.get()
@@ -564,22 +500,23 @@ class PresetManager:
             print("Error: Preset not found.")
             return
 
-        # Generate the waveform
-        if preset_type == "Additive":
-            waveform = self.app.additive_synth.generate_waveform()
-        elif preset_type == "Subtractive":
-            waveform = self.app.subtractive_synth.generate_waveform()
-        else:
-            print("Error: Unknown preset type.")
-            return
-
         # Prompt the user to choose a file path
         file_path = filedialog.asksaveasfilename(defaultextension=".wav", filetypes=[("WAV Files", "*.wav")])
         if file_path:
-            # Save the waveform as a .WAV file
-            wavfile.write(file_path, self.app.sample_rate, waveform)
+            # Stream the selected preset itself to disk, not whatever the synth tabs currently show
+            duration = self.app.duration if preset_type == "Subtractive" else None
+            export_wav(preset_data, file_path, self.app.sample_rate, duration, self.wav_format_var.get(), cache=get_cache())
             print(f"Waveform saved as {file_path}")
 
+    def render_all_to_wav(self):
+        """Render every preset of the user to .WAV files in a chosen folder, in the background."""
+        output_dir = filedialog.askdirectory(title="Choose a folder for the rendered presets")
+        if not output_dir:
+            return
+
+        # A process of its own, so the render workers don't re-import the GUI
+        start_batch_render(output_dir, self.db_path, self.Uid, self.app.sample_rate, self.wav_format_var.get())
+
 import sqlite3
 import json
 import customtkinter as ctk
@@ -0,0 +1,257 @@
+import sqlite3
+import json
+
+
+# Oscillator columns added after the first schema: (name, definition, default)
+OSCILLATOR_COLUMNS = (
+    ("unison", "INTEGER NOT NULL DEFAULT 1", 1),
+    ("detune", "REAL NOT NULL DEFAULT 0", 0.0),
+    ("spread", "REAL NOT NULL DEFAULT 0", 0.0),
+)
+
+# Additive preset columns added after the first schema: (name, definition, default)
+ADDITIVE_COLUMNS = (
+    ("rolloff", "REAL DEFAULT 1.0", 1.0),
+)
+
+# Phase-modulation edges between a preset's oscillators, by their position in the preset
+FM_TABLE = """
+    CREATE TABLE IF NOT EXISTS SubtractivePresetFM (
+        Fid INTEGER PRIMARY KEY AUTOINCREMENT,
+        Sid INTEGER NOT NULL,
+        source INTEGER NOT NULL,
+        target INTEGER NOT NULL,
+        depth REAL NOT NULL,
+        FOREIGN KEY (Sid) REFERENCES SubtractivePresets(Sid) ON DELETE CASCADE
+    )
+"""
+
+
+def table_columns(cursor, table):
+    """Get the names of a table's columns."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def migrate(connection):
+    """
+    Bring an older database up to the current schema.
+
+    Adds any missing additive and oscillator columns with their defaults
+    and the FM table, so existing presets load unchanged. Safe to run on
+    every start.
+    """
+    cursor = connection.cursor()
+    for table, added in (("AdditivePresets", ADDITIVE_COLUMNS), ("SubtractivePresetOscillators", OSCILLATOR_COLUMNS)):
+        columns = table_columns(cursor, table)
+        for name, definition, _ in added:
+            if name not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    cursor.execute(FM_TABLE)
+    connection.commit()
+
+
+class PresetStore:
+    """
+    Read-only access to the presets saved in the database, without any UI.
+
+    The preset manager and the batch renderer both load presets through this
+    class, so a render outside the GUI sees exactly what the GUI would load.
+    """
+
+    def __init__(self, db_path="synth.db", Uid=None):
+        """
+        Args:
+            db_path (str): Path to the SQLite database.
+            Uid (int): Only see this user's presets; None sees every user's.
+        """
+        self.db_path = db_path
+        self.Uid = Uid
+
+    def user_filter(self, column="Uid"):
+        """Get the SQL condition and parameters restricting a query to the store's user."""
+        if self.Uid is None:
+            return "1 = 1", ()
+        return f"{column} = ?", (self.Uid,)
+
+    def list_presets(self):
+        """
+        List every preset in the store, additive first.
+
+        Returns:
+            list: (name, type, Uid, id) tuples, where id is the preset's Aid
+                or Sid. Without a user, names can repeat across users, so
+                the id is what tells presets apart.
+        """
+        connection = sqlite3.connect(self.db_path)
+        cursor = connection.cursor()
+        condition, params = self.user_filter()
+
+        try:
+            cursor.execute(f"SELECT name, 'Additive', Uid, Aid FROM AdditivePresets WHERE {condition} ORDER BY name, Uid", params)
+            presets = cursor.fetchall()
+            cursor.execute(f"SELECT name, 'Subtractive', Uid, Sid FROM SubtractivePresets WHERE {condition} ORDER BY name, Uid", params)
+            presets += cursor.fetchall()
+        finally:
+            connection.close()
+
+        return presets
+
+    def find_presets(self, preset_name):
+        """Get the (name, type, Uid, id) entries of every preset with the given name."""
+        return [entry for entry in self.list_presets() if entry[0] == preset_name]
+
+    def get_preset_type(self, preset_name):
+        """Get the type of a preset by its name, or None if it doesn't exist."""
+        for name, preset_type, _, _ in self.list_presets():
+            if name == preset_name:
+                return preset_type
+        return None
+
+    def preset_filter(self, preset_name, preset_id, id_column):
+        """Get the SQL condition and parameters selecting one preset, by id if given, otherwise by name."""
+        if preset_id is not None:
+            return f"{id_column} = ?", (preset_id,)
+        condition, params = self.user_filter()
+        return f"{condition} AND name = ?", params + (preset_name,)
+
+    def load_preset_data(self, preset_name, preset_type, preset_id=None):
+        """
+        Retrieve preset data from the database.
+
+        Args:
+            preset_name (str): Name of the preset.
+            preset_type (str): "Additive" or "Subtractive".
+            preset_id (int): The preset's Aid or Sid, from list_presets();
+                needed to pick between presets of the same name.
+        """
+        connection = sqlite3.connect(self.db_path)
+        cursor = connection.cursor()
+
+        try:
+            if preset_type == "Additive":
+                condition, params = self.preset_filter(preset_name, preset_id, "Aid")
+                # A database that hasn't been migrated yet gets the column defaults
+                columns = table_columns(cursor, "AdditivePresets")
+                selected = ", ".join(name if name in columns else repr(default) for name, _, default in ADDITIVE_COLUMNS)
+                cursor.execute(f"""
+                    SELECT base_frequency, sample_rate, duration, volume, tone, num_harmonics, attack, decay, sustain, release, {selected}
+                    FROM AdditivePresets
+                    WHERE {condition}
+                """, params)
+                result = cursor.fetchone()
+
+                if not result:
+                    print(f"Error: Additive Preset '{preset_name}' not found.")
+                    return None
+
+                # Extract the data
+                base_frequency, sample_rate, duration, volume, tone, num_harmonics, attack, decay, sustain, release, rolloff = result
+
+                return {
+                    "type": preset_type,
+                    "name": preset_name,
+                    "base_frequency": base_frequency,
+                    "sample_rate": sample_rate,
+                    "duration": duration,
+                    "volume": volume,
+                    "tone": tone,
+                    "num_harmonics": num_harmonics,
+                    "rolloff": 1.0 if rolloff is None else rolloff,
+                    "adsr": {
+                        "attack": attack,
+                        "decay": decay,
+                        "sustain": sustain,
+                        "release": release,
+                    },
+                }
+
+            elif preset_type == "Subtractive":
+                condition, params = self.preset_filter(preset_name, preset_id, "Sid")
+                cursor.execute(f"""
+                    SELECT Sid, volume FROM SubtractivePresets
+                    WHERE {condition}
+                """, params)
+                preset = cursor.fetchone()
+
+                if not preset:
+                    print(f"Error: Subtractive Preset '{preset_name}' not found.")
+                    return None
+
+                Sid, volume = preset
+
+                # Retrieve filters
+                cursor.execute("""
+                    SELECT filter_type, cutoff_frequency, resonance FROM SubtractivePresetFilters
+                    WHERE Sid = ?
+                """, (Sid,))
+                filters = [{"type": row[0], "cutoff": row[1], "resonance": row[2]} for row in cursor.fetchall()]
+
+                # Retrieve oscillators; a database that hasn't been migrated yet gets the column defaults
+                columns = table_columns(cursor, "SubtractivePresetOscillators")
+                extra = [(name, default) for name, _, default in OSCILLATOR_COLUMNS]
+                selected = ", ".join(name if name in columns else repr(default) for name, default in extra)
+                cursor.execute(f"""
+                    SELECT type, frequency, amplitude, {selected} FROM SubtractivePresetOscillators
+                    WHERE Sid = ?
+                """, (Sid,))
+                oscillators = [
+                    dict({"type": row[0], "frequency": row[1], "amplitude": row[2]}, **dict(zip((name for name, _ in extra), row[3:])))
+                    for row in cursor.fetchall()
+                ]
+
+                # Retrieve effects
+                cursor.execute("""
+                    SELECT e.name, spe.parameters FROM SubtractivePresetEffects spe
+                    JOIN Effects e ON spe.Eid = e.Eid
+                    WHERE spe.Sid = ?
+                """, (Sid,))
+                effects = [{"type": row[0], "params": json.loads(row[1])} for row in cursor.fetchall()]
+
+                # Retrieve LFOs
+                cursor.execute("""
+                    SELECT shape, frequency, depth, target FROM SubtractivePresetLFOs
+                    WHERE Sid = ?
+                """, (Sid,))
+                lfos = [{"shape": row[0], "frequency": row[1], "depth": row[2], "target": row[3]} for row in cursor.fetchall()]
+
+                # Retrieve the FM matrix, if the database has one yet
+                fm = []
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'SubtractivePresetFM'")
+                if cursor.fetchone():
+                    cursor.execute("""
+                        SELECT source, target, depth FROM SubtractivePresetFM
+                        WHERE Sid = ?
+                    """, (Sid,))
+                    fm = [{"source": row[0], "target": row[1], "depth": row[2]} for row in cursor.fetchall()]
+
+                return {
+                    "type": preset_type,
+                    "name": preset_name,
+                    "volume": volume,
+                    "oscillators": oscillators,
+                    "filters": filters,
+                    "effects": effects,
+                    "lfos": lfos,
+                    "fm": fm,
+                }
+
+            print(f"Error: Unknown synth type '{preset_type}'.")
+            return None
+        finally:
+            connection.close()
+
+    def load_presets(self, names=None):
+        """
+        Load the data of the named presets (every preset if names is None), skipping any that are missing.
+
+        Each preset is loaded by its id, so presets of different users that
+        share a name are all loaded; every dict also carries its owner's "Uid".
+        """
+        presets = []
+        for name, preset_type, Uid, preset_id in self.list_presets():
+            if names is None or name in names:
+                preset_data = self.load_preset_data(name, preset_type, preset_id)
+                if preset_data:
+                    presets.append(dict(preset_data, Uid=Uid))
+        return presets
@@ -0,0 +1,108 @@
+"""
+Fixed subtractive presets that exercise every stage of the render.
+
+`python -m cli check-precision` renders these at both precisions by
+default, so the float32 accuracy bound covers the IIR, FIR and modulated
+filters, every effect (oversampled ones included), unison voices and FM,
+regardless of which presets the database holds. The convolution reverb
+needs an impulse response file, which write_impulse_response() creates.
+"""
+import numpy as np
+
+from effects import EFFECT_TYPES
+
+
+IMPULSE_RESPONSE_RATE = 32768
+
+
+def write_impulse_response(path, seconds=0.5, seed=0):
+    """Write a deterministic impulse response (exponentially decaying noise) to a WAV file."""
+    import scipy.io.wavfile as wavfile
+
+    num_samples = int(seconds * IMPULSE_RESPONSE_RATE)
+    noise = np.random.default_rng(seed).standard_normal(num_samples)
+    decay = np.exp(-6.9 * np.arange(num_samples) / num_samples)  # -60 dB at the end
+    wavfile.write(path, IMPULSE_RESPONSE_RATE, (noise * decay).astype(np.float32))
+
+
+def reference_presets(ir_path):
+    """
+    Get the reference presets.
+
+    Args:
+        ir_path (str): Impulse response for the convolution reverb, as
+            written by write_impulse_response().
+
+    Returns:
+        list: Subtractive preset dicts; together their effects cover EFFECT_TYPES.
+    """
+    def preset(name, oscillators, filters=(), effects=(), lfos=(), fm=()):
+        return {
+            "type": "Subtractive",
+            "name": name,
+            "volume": 0.5,
+            "oscillators": list(oscillators),
+            "filters": list(filters),
+            "effects": [{"type": effect_type, "params": params} for effect_type, params in effects],
+            "lfos": list(lfos),
+            "fm": list(fm),
+        }
+
+    saw = {"type": "Sawtooth", "frequency": 110.0, "amplitude": 0.6}
+    square = {"type": "Square", "frequency": 220.5, "amplitude": 0.3}
+    sine = {"type": "Sine", "frequency": 440.0, "amplitude": 0.5}
+
+    presets = [
+        preset("IIR filters", [saw, square], filters=[
+            {"type": "Low-pass", "cutoff": 3000.0, "resonance": 2.0},
+            {"type": "High-pass", "cutoff": 80.0, "resonance": 0.7},
+            {"type": "Band-pass", "cutoff": 1200.0, "resonance": 400.0},  # The resonance is the half-bandwidth in Hz
+            {"type": "Band-reject", "cutoff": 600.0, "resonance": 1.0},
+        ]),
+        preset("FIR filter", [saw, square], filters=[
+            {"type": "Linear-phase FIR", "cutoff": 1500.0, "resonance": 1.0},
+            {"type": "High-pass", "cutoff": 100.0, "resonance": 0.7},
+        ]),
+        preset("Modulated filter", [saw], filters=[
+            {"type": "Low-pass", "cutoff": 2000.0, "resonance": 4.0},
+        ], lfos=[
+            {"shape": "Sine", "frequency": 2.0, "depth": 0.8, "target": "Filter Cutoff"},
+            {"shape": "Triangle", "frequency": 5.0, "depth": 0.1, "target": "Frequency"},
+            {"shape": "Square", "frequency": 3.0, "depth": 0.3, "target": "Amplitude"},
+        ]),
+        preset("Unison", [
+            dict(saw, unison=7, detune=25.0, spread=1.0),
+            dict(sine, type="Triangle", unison=3, detune=10.0, spread=0.5),
+        ], filters=[{"type": "Low-pass", "cutoff": 5000.0, "resonance": 0.7}]),
+        preset("FM", [
+            dict(sine, frequency=220.0, amplitude=0.0),
+            dict(sine, frequency=440.0),
+            dict(sine, frequency=110.0, amplitude=0.3),
+            dict(saw, frequency=55.0, amplitude=0.2),
+        ], fm=[
+            {"source": 0, "target": 1, "depth": 2.0},
+            {"source": 2, "target": 3, "depth": 1.0},
+            {"source": 3, "target": 2, "depth": 0.5},
+            {"source": 2, "target": 2, "depth": 0.3},
+        ]),
+        preset("Modulation effects", [saw, sine], effects=[
+            ("Phaser", {"num_stages": 6, "sweep_freq": 0.5, "depth": 0.7}),
+            ("Flanger", {"max_delay": 5.0, "rate": 0.25, "feedback": 0.6}),
+            ("Chorus", {"detune": 0.02, "delay": 5.0, "voices": 3}),
+        ]),
+        preset("Nonlinear effects", [saw, sine], effects=[
+            ("Wavefolder", {"threshold": 0.3, "oversampling": 4}),
+            ("Ring Modulation", {"mod_freq": 300.0, "oversampling": 2}),
+            ("Bitcrusher", {"bit_depth": 12, "sample_rate_reduction": 2, "oversampling": 8}),
+        ]),
+        preset("Reverbs", [saw, square], effects=[
+            ("Convolution Reverb", {"ir_path": ir_path, "mix": 0.4}),
+            ("Algorithmic Reverb", {"decay": 1.5, "size": 1.0, "damping": 0.3, "mix": 0.3, "lines": 8}),
+        ]),
+    ]
+
+    covered = {effect["type"] for data in presets for effect in data["effects"]}
+    missing = set(EFFECT_TYPES) - covered
+    if missing:
+        raise ValueError(f"Reference presets don't cover effects: {sorted(missing)}")
+    return presets
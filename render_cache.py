@@ -0,0 +1,158 @@
+"""
+Content-addressed on-disk cache of rendered audio.
+
+Renders are keyed by a SHA-256 of the normalized preset (without its name),
+the sample rate, the duration, the render precision, the modification times of any
+impulse-response files and ENGINE_VERSION, so an identical preset
+saved under another name, or by another user, is a hit too. Audio is stored
+as .npy files in the render's dtype (float32, or float64 in the reference
+precision) and read back memory-mapped. Files are written to a
+temporary name and renamed into place, so a crash or a concurrent batch
+worker never leaves a half-written entry. Once the cache outgrows its size
+limit, the least recently used entries are deleted.
+
+The directory defaults to ~/.cache/synth (override with SYNTH_CACHE_DIR),
+and the size limit to 512 MB (override with SYNTH_CACHE_MB).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+import precision
+from engine import DEFAULT_SAMPLE_RATE, ENGINE_VERSION, AdditivePreset, load_preset, render
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "synth")
+DEFAULT_MAX_MB = 512
+
+
+class RenderCache:
+    def __init__(self, directory=None, max_bytes=None):
+        """
+        Args:
+            directory (str): Where to keep the cache; created if needed.
+            max_bytes (int): Size limit, above which old entries are evicted.
+        """
+        self.directory = directory or os.environ.get("SYNTH_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes or int(float(os.environ.get("SYNTH_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def resolve(preset, sample_rate=None, duration=None):
+        """Normalize a preset and fill in the sample rate and duration render() would use."""
+        preset = load_preset(preset) if isinstance(preset, dict) else preset
+        if isinstance(preset, AdditivePreset):
+            sample_rate = preset.sample_rate if sample_rate is None else sample_rate
+            duration = preset.duration if duration is None else duration
+        return preset, int(sample_rate or DEFAULT_SAMPLE_RATE), float(1.0 if duration is None else duration)
+
+    def key(self, preset, sample_rate=None, duration=None):
+        """Get the cache key of a render."""
+        preset, sample_rate, duration = self.resolve(preset, sample_rate, duration)
+        data = preset.to_dict()
+        data.pop("name", None)
+        if isinstance(preset, AdditivePreset):
+            # The render arguments take the place of the preset's own rate and duration
+            data.pop("sample_rate", None)
+            data.pop("duration", None)
+        # Impulse responses live outside the preset, so an edited file must change the key too
+        responses = [effect["params"]["ir_path"] for effect in data.get("effects", []) if effect["params"].get("ir_path")]
+        modified = [os.path.getmtime(path) if os.path.exists(path) else None for path in responses]
+        blob = json.dumps([ENGINE_VERSION, precision.get_precision(), sample_rate, duration, data, modified], sort_keys=True)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key):
+        """Get a cached render as a read-only memory map, or None on a miss."""
+        path = self.path(key)
+        try:
+            waveform = np.load(path, mmap_mode="r")
+            # Entries written before renders kept their dtype are all float32, even under a float64 key
+            if waveform.dtype != precision.get_dtype():
+                return None
+            os.utime(path)  # Mark it as recently used
+            return waveform
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Discarding unreadable cache entry {path}: {e}")
+            self.remove(path)
+            return None
+
+    def put(self, key, waveform):
+        """Store a render atomically, then evict old entries if the cache is over its limit."""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.save(file, np.asarray(waveform))
+            os.replace(temp_path, self.path(key))
+        except OSError as e:
+            print(f"Error writing cache entry: {e}")
+            self.remove(temp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits its size limit."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Already gone, or still open elsewhere (Windows); a later eviction retries
+
+    def clear(self):
+        """Delete every cached render."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith((".npy", ".tmp")):
+                self.remove(entry.path)
+
+    def render(self, preset, sample_rate=None, duration=None, workers=None):
+        """
+        Render a preset through the cache.
+
+        Takes the same arguments as engine.render(). Hits are returned as
+        read-only memory maps, misses as arrays, both in the dtype of the
+        current precision.
+        """
+        preset, sample_rate, duration = self.resolve(preset, sample_rate, duration)
+        key = self.key(preset, sample_rate, duration)
+        waveform = self.get(key)
+        if waveform is None:
+            waveform = render(preset, sample_rate, duration, workers)
+            self.put(key, waveform)
+        return waveform
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Get the shared cache, configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
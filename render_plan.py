@@ -0,0 +1,788 @@
+"""
+Compiled render plans for the subtractive synth.
+
+compile_preset() turns a preset dict (the shape SubtractiveSynth.get_preset_data
+returns) into an immutable RenderPlan: a small DAG of modulation, oscillator,
+filter and effect nodes with every parameter resolved up front and filter
+coefficients precomputed. Modulation nodes feed the oscillators and the
+filter by target name; the oscillators are summed into the filter, which
+feeds the effects in order. The IIR filters run as one SOS cascade and the
+linear-phase FIR filters as one merged kernel after it, with the FIR latency
+removed so the filtered signal lines up with the oscillators.
+
+Oscillators can also phase-modulate each other through an FM matrix. They
+are then evaluated in an order where every modulator comes before what it
+modulates, and loops run through a one-sample-delayed kernel.
+
+A plan never touches a widget, so it can be executed on any thread, cached,
+and executed again cheaply. Long renders split the oscillators into time
+segments on the parallel thread pool (unless an FM loop carries state from
+sample to sample); the filters and effects are recursive and run serially
+over the merged mix.
+
+Levels are set without looking at the rendered audio: the mix is scaled by a
+static gain from the oscillator amplitudes, and a look-ahead limiter at the
+end of the chain catches whatever the filters and effects push over full
+scale. A render can therefore be streamed in a single pass.
+
+Audio buffers use the precision set in the precision module (float32 by
+default); time and phase are always computed in float64.
+"""
+import json
+from dataclasses import dataclass, field, replace
+from functools import cached_property, lru_cache
+import numpy as np
+
+import parallel
+import precision
+from buffers import BufferArena
+from effects import EffectChain, create_effect
+from filters import (
+    FIR_FILTER_TYPES, IIR_FILTER_TYPES, FIRFilter, SOSFilter, ModulatedFilterChain, coefficient_table, design_sos,
+)
+from kernels import phase_feedback
+from limiter import Limiter, limit_blocks
+
+
+def to_float(value, default):
+    """Convert a preset value to float, falling back to a default if it isn't a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True)
+class LFONode:
+    shape: str
+    frequency: float
+    depth: float
+
+
+@dataclass(frozen=True)
+class ModulationNode:
+    """The sum of every LFO routed to one target."""
+    target: str
+    lfos: tuple
+
+    def render(self, t, out, scratch):
+        """Write the modulation at times t (seconds) into out, using scratch for each LFO."""
+        out.fill(0)
+        for lfo in self.lfos:
+            # Generate the modulation signal from the number of cycles elapsed
+            cycles = np.multiply(t, lfo.frequency, out=scratch)
+            if lfo.shape in ("Sine", "Square"):
+                cycles *= 2 * np.pi
+                np.sin(cycles, out=cycles)
+                if lfo.shape == "Square":
+                    np.sign(cycles, out=cycles)
+            elif lfo.shape == "Triangle":
+                # 2 * |2 * (x - floor(x + 0.5))| - 1, with x - floor(x + 0.5) = ((x + 0.5) mod 1) - 0.5
+                cycles += 0.5
+                np.mod(cycles, 1, out=cycles)
+                cycles -= 0.5
+                np.abs(cycles, out=cycles)
+                cycles *= 4
+                cycles -= 1
+            elif lfo.shape == "Sawtooth":
+                np.mod(cycles, 1, out=cycles)
+                cycles *= 2
+            else:
+                continue
+
+            cycles *= lfo.depth
+            out += cycles  # Combine signals if multiple LFOs target the same parameter
+        return out
+
+
+# Samples per step of a unison render; a (voices x UNISON_CHUNK) float64 array fits in L2 cache
+UNISON_CHUNK = 4096
+
+
+@dataclass(frozen=True)
+class OscillatorNode:
+    """
+    One oscillator, swung by the "Frequency" and "Amplitude" modulation nodes.
+
+    With unison above 1 the oscillator is a stack of voices detuned evenly
+    across `detune` cents and averaged. `spread` (0 to 1) staggers their
+    start phases, so they don't all begin in phase.
+    """
+    WAVEFORM_TYPES = ("Sine", "Square", "Sawtooth", "Triangle")
+    MAX_UNISON = 16
+
+    waveform_type: str
+    frequency: float
+    amplitude: float
+    unison: int = 1
+    detune: float = 0.0
+    spread: float = 0.0
+
+    @property
+    def peak(self):
+        """The highest level this oscillator reaches without amplitude modulation."""
+        return min(max(self.amplitude, 0.0), 1.0) if self.waveform_type in self.WAVEFORM_TYPES else 0.0
+
+    def voice_ratios(self):
+        """Get the frequency ratio of each unison voice to the oscillator frequency."""
+        return 2.0 ** (self.detune / 1200 * np.linspace(-0.5, 0.5, self.unison))
+
+    def initial_phase(self):
+        """Get the phase at sample 0: 0.0 for a single voice, or an array with one phase per unison voice."""
+        if self.unison == 1:
+            return 0.0
+        # Golden-ratio steps spread the voices evenly without lining any two up
+        return 2 * np.pi * self.spread * ((np.arange(self.unison) * 0.6180339887498949) % 1)
+
+    def shape(self, phase):
+        """Turn phases (radians) into the waveform in place; returns False for an unknown waveform."""
+        if self.waveform_type in ("Sine", "Square"):
+            np.sin(phase, out=phase)
+            if self.waveform_type == "Square":
+                np.sign(phase, out=phase)
+        elif self.waveform_type in ("Sawtooth", "Triangle"):
+            phase /= 2 * np.pi
+            np.mod(phase, 1, out=phase)
+            phase *= 2
+            phase -= 1
+            if self.waveform_type == "Triangle":
+                np.abs(phase, out=phase)
+                phase *= 2
+        else:
+            return False
+        return True
+
+    def advance(self, freq_swing, start_phase, sample_rate, phase):
+        """Integrate the modulated frequency of a single voice into phase, returning the phase reached at the end."""
+        # Modulated frequency, clamped, then integrated into the instantaneous phase
+        np.multiply(freq_swing, self.frequency, out=phase)
+        np.clip(phase, 20, sample_rate / 2, out=phase)
+        np.cumsum(phase, out=phase)
+        phase *= 2 * np.pi / sample_rate
+        phase += start_phase
+        return phase[-1] % (2 * np.pi) if len(phase) else start_phase
+
+    def level(self, amp_swing, out):
+        """Write the modulated, clamped amplitude into out."""
+        np.multiply(amp_swing, self.amplitude, out=out)
+        np.clip(out, 0.0, 1.0, out=out)
+        return out
+
+    def render(self, freq_swing, amp_swing, start_phase, sample_rate, phase, amplitude, out, modulation=None, wave=None):
+        """
+        Add this oscillator to out.
+
+        Args:
+            freq_swing, amp_swing (np.ndarray): Modulation factors around 1.
+            start_phase (float or np.ndarray): Phase (per voice, with unison)
+                reached at the end of the previous block.
+            phase, amplitude (np.ndarray): Scratch buffers.
+            out (np.ndarray): The mix to add into.
+            modulation (np.ndarray): Phase modulation (radians) added to
+                every voice, if the oscillator is an FM carrier.
+            wave (np.ndarray): Receives the waveform at unit level, if the
+                oscillator modulates another.
+
+        Returns:
+            float or np.ndarray: The phase reached at the end of this block.
+        """
+        if self.unison > 1:
+            return self.render_unison(freq_swing, amp_swing, start_phase, sample_rate, phase, amplitude, out, modulation, wave)
+
+        end_phase = self.advance(freq_swing, start_phase, sample_rate, phase)
+        self.level(amp_swing, amplitude)
+        if modulation is not None:
+            phase += modulation
+
+        # Generate the waveform in the phase buffer
+        if not self.shape(phase):
+            if wave is not None:
+                wave.fill(0)
+            return end_phase
+        if wave is not None:
+            np.copyto(wave, phase)
+        phase *= amplitude
+        out += phase
+        return end_phase
+
+    def render_unison(self, freq_swing, amp_swing, start_phases, sample_rate, frequency, amplitude, out, modulation=None, wave=None):
+        """
+        Add every unison voice to out at once.
+
+        The voices' phases form one (voices x samples) array, shaped in single
+        NumPy calls and averaged in one reduction, so a seven-voice stack costs
+        about one pass over a seven-times larger array. While no voice reaches
+        the frequency clamp, every voice's phase is its ratio times the same
+        integrated phase, so only that one row is integrated. The array is
+        filled UNISON_CHUNK samples at a time, so it stays in cache.
+        """
+        if self.waveform_type not in self.WAVEFORM_TYPES:
+            if wave is not None:
+                wave.fill(0)
+            return start_phases
+
+        np.multiply(freq_swing, self.frequency, out=frequency)
+        ratios = self.voice_ratios()
+        # A negative detune reverses the voice order, so don't rely on the ratios being sorted
+        clamped = len(frequency) and (frequency.min() * ratios.min() < 20 or frequency.max() * ratios.max() > sample_rate / 2)
+        if not clamped:
+            np.cumsum(frequency, out=frequency)
+            frequency *= 2 * np.pi / sample_rate
+
+        buffer = np.empty((self.unison, min(UNISON_CHUNK, len(frequency))))
+        phases_end = start_phases
+        for start in range(0, len(frequency), UNISON_CHUNK):
+            chunk = frequency[start:start + UNISON_CHUNK]
+            phases = buffer[:, :len(chunk)]
+            np.multiply.outer(ratios, chunk, out=phases)
+            if clamped:
+                np.clip(phases, 20, sample_rate / 2, out=phases)
+                np.cumsum(phases, axis=1, out=phases)
+                phases *= 2 * np.pi / sample_rate
+                phases += phases_end[:, None]
+            else:
+                phases += start_phases[:, None]
+            phases_end = phases[:, -1] % (2 * np.pi)
+            if modulation is not None:
+                phases += modulation[start:start + UNISON_CHUNK]
+            self.shape(phases)
+            phases.sum(axis=0, out=chunk)  # The chunk's phases are no longer needed
+
+        if wave is not None:
+            np.multiply(frequency, 1 / self.unison, out=wave)
+        np.multiply(amp_swing, self.amplitude / self.unison, out=amplitude)
+        np.clip(amplitude, 0.0, 1.0 / self.unison, out=amplitude)
+        frequency *= amplitude
+        out += frequency
+        return phases_end
+
+
+@dataclass(frozen=True)
+class FMStage:
+    """
+    One step of the FM evaluation order.
+
+    A stage is a single oscillator, or a loop of oscillators that modulate
+    each other (or one that modulates itself). A loop is evaluated sample by
+    sample: `forward` holds the depths of edges from an earlier operator of
+    the loop, which use the same sample, and `delayed` those of the edges
+    that close the loop, which use the previous one.
+    """
+    operators: tuple
+    feedback: bool = False
+    shapes: np.ndarray = field(default=None, compare=False)
+    forward: np.ndarray = field(default=None, compare=False)
+    delayed: np.ndarray = field(default=None, compare=False)
+
+
+@dataclass(frozen=True)
+class FMNode:
+    """
+    The phase-modulation matrix between the oscillators.
+
+    Each edge (source, target, depth) adds depth radians times the source's
+    unit-level waveform to the target's phase. Stages list the oscillators
+    in evaluation order.
+    """
+    edges: tuple = ()
+    stages: tuple = ()
+
+    @property
+    def has_feedback(self):
+        return any(stage.feedback for stage in self.stages)
+
+    @property
+    def sources(self):
+        return {source for source, _, _ in self.edges}
+
+    def inputs(self, target, exclude=()):
+        """Get (source, depth) for every edge into target, except from the excluded oscillators."""
+        return [(source, depth) for source, edge_target, depth in self.edges if edge_target == target and source not in exclude]
+
+
+def fm_stages(oscillators, edges):
+    """
+    Order the oscillators so every modulator is evaluated before what it modulates.
+
+    Oscillators that reach each other along the edges form a loop and share a
+    stage; the stages are then sorted topologically, ties going to the lowest
+    oscillator index.
+    """
+    count = len(oscillators)
+    # reach[i, j]: a chain of edges leads from oscillator i to oscillator j
+    reach = np.zeros((count, count), dtype=bool)
+    for source, target, _ in edges:
+        reach[source, target] = True
+    for k in range(count):
+        reach |= reach[:, k:k + 1] & reach[k:k + 1, :]
+
+    groups = []
+    for i in range(count):
+        if not any(i in group for group in groups):
+            groups.append(tuple(j for j in range(count) if j == i or (reach[i, j] and reach[j, i])))
+
+    stages = []
+    while groups:
+        group = next(g for g in groups if not any(reach[j, g[0]] for other in groups if other is not g for j in other))
+        groups.remove(group)
+        if len(group) == 1 and not reach[group[0], group[0]]:
+            stages.append(FMStage(group))
+            continue
+
+        position = {index: row for row, index in enumerate(group)}
+        forward = np.zeros((len(group), len(group)))
+        delayed = np.zeros((len(group), len(group)))
+        for source, target, depth in edges:
+            if source in position and target in position:
+                matrix = forward if position[source] < position[target] else delayed
+                matrix[position[source], position[target]] += depth
+        shapes = np.array([
+            OscillatorNode.WAVEFORM_TYPES.index(oscillators[index].waveform_type)
+            if oscillators[index].waveform_type in OscillatorNode.WAVEFORM_TYPES else -1
+            for index in group
+        ])
+        stages.append(FMStage(group, True, shapes, forward, delayed))
+    return tuple(stages)
+
+
+@dataclass(frozen=True)
+class FilterNode:
+    """
+    The filter chain, swung by the "Filter Cutoff" modulation node if it has one.
+
+    Static chains carry their fused SOS cascade; modulated chains have their
+    cutoff tables built (and cached) when the plan is compiled. The FIR
+    filters, as (cutoff, resonance) pairs, are never modulated.
+    """
+    settings: tuple
+    modulated: bool
+    sos: np.ndarray = field(default=None, compare=False)
+    fir: tuple = ()
+
+    def create_processor(self, sample_rate, dtype=float):
+        """Create a fresh stateful processor for this chain, running at the given sample dtype."""
+        if self.modulated:
+            return ModulatedFilterChain(self.settings, sample_rate, dtype=dtype)
+        return SOSFilter(self.sos, dtype)
+
+    def create_fir(self, sample_rate, dtype=float):
+        """Create the processor for the FIR filters, or None if there aren't any."""
+        return FIRFilter(self.fir, sample_rate, dtype=dtype) if self.fir else None
+
+
+@dataclass(frozen=True)
+class EffectNode:
+    effect_type: str
+    params: tuple
+
+    def create_processor(self, sample_rate, dtype=float):
+        """Create a fresh stateful processor for this effect, running at the given sample dtype."""
+        return create_effect(self.effect_type, sample_rate, dict(self.params), dtype)
+
+
+@dataclass(frozen=True, eq=False)
+class RenderPlan:
+    sample_rate: int
+    num_samples: int
+    volume: float
+    modulations: tuple
+    oscillators: tuple
+    fm: FMNode
+    filter: FilterNode
+    effects: tuple
+
+    def modulation(self, target):
+        """Get the modulation node for a target, or None if no LFO is routed to it."""
+        for node in self.modulations:
+            if node.target == target:
+                return node
+        return None
+
+    def start(self, arena=None, position=0):
+        """Start a new execution of the plan at a sample position, with fresh oscillator, filter and effect state."""
+        return PlanExecution(self, arena, position)
+
+    def oscillator_mix(self, arena=None, workers=None):
+        """
+        Render the raw (unscaled) oscillator mix.
+
+        Long renders are split into time segments across the thread pool. Each
+        segment starts from the phase its oscillators reach at its first
+        sample, which is the sum of the phase advances of the segments before
+        it, so those are computed first.
+        """
+        segments = parallel.segments(self.num_samples, workers)
+        # An FM loop's state at each sample depends on the one before, so it can't start mid-way
+        if len(segments) == 1 or self.fm.has_feedback:
+            return self.start(arena).oscillators(self.num_samples)
+
+        # Phases are flattened to one value per voice while the segments are summed
+        advances = parallel.run(lambda start, stop: self.start(position=start).phase_advance(stop - start), *zip(*segments))
+        initial = np.concatenate([np.atleast_1d(oscillator.initial_phase()) for oscillator in self.oscillators])
+        start_phases = (initial + np.cumsum([np.zeros(len(initial))] + advances[:-1], axis=0)) % (2 * np.pi)
+
+        waveform = np.empty(self.num_samples, dtype=precision.get_dtype())
+
+        def render_segment(segment, phases):
+            start, stop = segment
+            execution = self.start(position=start)
+            execution.phases = self.split_phases(phases)
+            execution.oscillators(stop - start, out=waveform[start:stop])
+
+        parallel.run(render_segment, segments, start_phases)
+        return waveform
+
+    def split_phases(self, phases):
+        """Split a flat array of voice phases into the per-oscillator phases an execution keeps."""
+        bounds = np.cumsum([0] + [oscillator.unison for oscillator in self.oscillators])
+        return [
+            phases[start] if oscillator.unison == 1 else phases[start:stop]
+            for oscillator, start, stop in zip(self.oscillators, bounds[:-1], bounds[1:])
+        ]
+
+    @property
+    def mix_gain(self):
+        """Static gain that brings the oscillator mix to the master volume at its unmodulated peak."""
+        headroom = sum(oscillator.peak for oscillator in self.oscillators)
+        return self.volume / headroom if headroom > 0 else self.volume
+
+    def render_oscillators(self, arena=None, workers=None):
+        """Render the oscillator mix at the master volume."""
+        waveform = self.oscillator_mix(arena, workers)
+        waveform *= self.mix_gain
+        return waveform
+
+    def apply_filters(self, waveform, arena=None):
+        """Filter a rendered oscillator mix."""
+        return self.start(arena).filter_all(waveform)
+
+    def render(self, arena=None, workers=None):
+        """Render the full chain: oscillators, filters, effects, then the limiter."""
+        execution = self.start(arena)
+        waveform = self.render_oscillators(arena, workers)
+        waveform = execution.filter_all(waveform)
+        waveform = execution.effect_all(waveform)
+        return join(limit_blocks(execution.limiter, [waveform]), execution.dtype)
+
+    def blocks(self, block_size=65536, arena=None):
+        """Yield the same audio as render() in blocks, holding only a few blocks in memory."""
+        execution = self.start(arena)
+        mix = np.empty(block_size, dtype=execution.dtype)
+
+        def mixes():
+            for start in range(0, self.num_samples, block_size):
+                block = execution.oscillators(min(block_size, self.num_samples - start), out=mix[:self.num_samples - start])
+                block *= self.mix_gain
+                yield block
+
+        yield from limit_blocks(execution.limiter, execution.effect_blocks(execution.filter_blocks(mixes())))
+
+
+class PlanExecution:
+    """
+    The running state of one execution of a plan.
+
+    Each stage keeps its own stream position, oscillator phases and filter and
+    effect state, so the stages can be run on the whole signal at once or
+    block by block. The filter, effect and limiter processors are built on
+    first use, so executions that only render oscillators (the segments of a
+    parallel render) don't set up the rest of the chain.
+    """
+
+    def __init__(self, plan, arena=None, position=0):
+        self.plan = plan
+        self.arena = arena if arena is not None else BufferArena()
+        self.dtype = precision.get_dtype()
+        self.phases = [oscillator.initial_phase() for oscillator in plan.oscillators]
+        self.fm_state = [np.zeros(len(stage.operators)) for stage in plan.fm.stages]
+        self.oscillator_position = position
+        self.filter_position = position
+
+    @cached_property
+    def filter(self):
+        return self.plan.filter.create_processor(self.plan.sample_rate, self.dtype)
+
+    @cached_property
+    def fir(self):
+        return self.plan.filter.create_fir(self.plan.sample_rate, self.dtype)
+
+    @cached_property
+    def effect_chain(self):
+        return EffectChain([effect.create_processor(self.plan.sample_rate, self.dtype) for effect in self.plan.effects])
+
+    @cached_property
+    def limiter(self):
+        return Limiter(self.plan.sample_rate, dtype=self.dtype)
+
+    def swing(self, target, t, out, scratch):
+        """Write the ±50% swing factor for a modulation target into out."""
+        node = self.plan.modulation(target)
+        if node is None:
+            out.fill(1)
+            return out
+        node.render(t, out, scratch)
+        out *= 0.5
+        out += 1
+        return out
+
+    def times(self, position, num_samples):
+        """Get an arena buffer holding the times (seconds) of the given samples."""
+        t = np.add(self.arena.ramp(num_samples), position, out=self.arena.take(num_samples))
+        t *= 1 / self.plan.sample_rate
+        return t
+
+    def oscillators(self, num_samples, out=None):
+        """Render the next num_samples of the raw (unscaled) oscillator mix."""
+        out = np.zeros(num_samples, dtype=self.dtype) if out is None else out
+        out.fill(0)
+        sample_rate = self.plan.sample_rate
+
+        # Every intermediate lives in the arena and is reused by the next render
+        with self.arena as arena:
+            t = self.times(self.oscillator_position, num_samples)
+            scratch = arena.take(num_samples)
+
+            # The swings are the same for every oscillator, so compute them once
+            freq_swing = self.swing("Frequency", t, arena.take(num_samples), scratch)
+            amp_swing = self.swing("Amplitude", t, arena.take(num_samples), scratch)
+
+            amplitude = arena.take(num_samples)
+            if self.plan.fm.edges:
+                self.modulated_oscillators(freq_swing, amp_swing, scratch, amplitude, out, arena)
+            else:
+                for index, oscillator in enumerate(self.plan.oscillators):
+                    self.phases[index] = oscillator.render(
+                        freq_swing, amp_swing, self.phases[index], sample_rate, scratch, amplitude, out
+                    )
+
+        self.oscillator_position += num_samples
+        return out
+
+    def modulated_oscillators(self, freq_swing, amp_swing, scratch, amplitude, out, arena):
+        """Add the oscillators to out stage by stage, each with its modulators' waveforms added to its phase."""
+        fm = self.plan.fm
+        sample_rate = self.plan.sample_rate
+        num_samples = len(out)
+        sources = fm.sources
+        waves = {}  # Unit-level waveform of every oscillator rendered so far that modulates another
+
+        def modulation(target, exclude=()):
+            inputs = fm.inputs(target, exclude)
+            if not inputs:
+                return None
+            total = arena.zeros(num_samples)
+            for source, depth in inputs:
+                total += depth * waves[source]
+            return total
+
+        for stage, state in zip(fm.stages, self.fm_state):
+            if not stage.feedback:
+                index = stage.operators[0]
+                wave = arena.take(num_samples) if index in sources else None
+                self.phases[index] = self.plan.oscillators[index].render(
+                    freq_swing, amp_swing, self.phases[index], sample_rate, scratch, amplitude, out, modulation(index), wave
+                )
+                waves[index] = wave
+                continue
+
+            # A loop: integrate each operator's own phase, add what comes from earlier stages, then run the kernel
+            phases = np.empty((len(stage.operators), num_samples))
+            for row, index in enumerate(stage.operators):
+                self.phases[index] = self.plan.oscillators[index].advance(freq_swing, self.phases[index], sample_rate, phases[row])
+                external = modulation(index, exclude=stage.operators)
+                if external is not None:
+                    phases[row] += external
+            stage_waves = phase_feedback(phases, stage.shapes, stage.forward, stage.delayed, state, np.empty_like(phases))
+
+            for row, index in enumerate(stage.operators):
+                waves[index] = stage_waves[row]
+                level = self.plan.oscillators[index].level(amp_swing, amplitude)
+                level *= stage_waves[row]
+                out += level
+
+    def phase_advance(self, num_samples):
+        """
+        Get how far each voice's phase advances over the next num_samples, without rendering them.
+
+        Returns:
+            np.ndarray: One advance per voice, the voices of each oscillator in turn.
+        """
+        sample_rate = self.plan.sample_rate
+        with self.arena as arena:
+            t = self.times(self.oscillator_position, num_samples)
+            scratch = arena.take(num_samples)
+            freq_swing = self.swing("Frequency", t, arena.take(num_samples), scratch)
+            advances = []
+            for oscillator in self.plan.oscillators:
+                # Same frequency clamp as OscillatorNode.render
+                np.multiply(freq_swing, oscillator.frequency, out=scratch)
+                if oscillator.unison == 1:
+                    np.clip(scratch, 20, sample_rate / 2, out=scratch)
+                    advances.append(scratch.sum() * 2 * np.pi / sample_rate)
+                else:
+                    frequencies = np.clip(np.multiply.outer(oscillator.voice_ratios(), scratch), 20, sample_rate / 2)
+                    advances.extend(frequencies.sum(axis=1) * 2 * np.pi / sample_rate)
+        return np.array(advances)
+
+    def filters(self, block):
+        """Filter the next block of the mix; the FIR filters, if any, delay it by fir.latency samples."""
+        num_samples = len(block)
+        if not self.plan.filter.modulated:
+            output = self.filter.process(block)
+        else:
+            with self.arena as arena:
+                t = self.times(self.filter_position, num_samples)
+                modulation = self.plan.modulation("Filter Cutoff").render(t, arena.take(num_samples), arena.take(num_samples))
+                output = self.filter.process(block, modulation)
+        if self.fir is not None:
+            output = self.fir.process(output)
+        self.filter_position += num_samples
+        return output
+
+    def filter_blocks(self, blocks):
+        """
+        Filter a stream of blocks, removing the FIR latency.
+
+        See remove_latency() for how the output is kept in line with the input.
+        """
+        outputs = (self.filters(block) for block in blocks)
+        if self.fir is None:
+            return outputs
+        return remove_latency(outputs, self.fir.latency, self.fir.flush)
+
+    def filter_all(self, waveform):
+        """Filter a whole signal at once, without the FIR latency."""
+        return join(self.filter_blocks([waveform]), self.dtype)
+
+    def effects(self, block, out=None):
+        """Run the next block through the effect chain, which delays it by effect_chain.latency samples."""
+        return self.effect_chain.process(block, out)
+
+    def effect_blocks(self, blocks):
+        """Run a stream of blocks through the effect chain in place, removing the latency of its effects."""
+        outputs = (self.effects(block, out=block) for block in blocks)
+        if not self.effect_chain.latency:
+            return outputs
+        return remove_latency(outputs, self.effect_chain.latency, lambda: self.effect_chain.flush(self.dtype))
+
+    def effect_all(self, waveform):
+        """Run a whole signal through the effect chain, without its latency."""
+        return join(self.effect_blocks([waveform]), self.dtype)
+
+    def limit(self, block, out=None):
+        """Run the next block through the limiter, which delays it by limiter.latency samples."""
+        return self.limiter.process(block, out)
+
+
+def remove_latency(outputs, latency, flush):
+    """
+    Line a delayed stream up with its input.
+
+    Like limit_blocks(), this drops the first `latency` samples of the
+    outputs and appends the rest of what flush() returns, so the stream has
+    the same length as the input.
+    """
+    skip = latency
+    for output in outputs:
+        if skip:
+            dropped = min(skip, len(output))
+            output = output[dropped:]
+            skip -= dropped
+        if len(output):
+            yield output
+    tail = flush()[skip:]
+    if len(tail):
+        yield tail
+
+
+def join(blocks, dtype):
+    """Concatenate a stream of blocks into one signal; a stream with no samples yields no blocks at all."""
+    blocks = list(blocks)
+    if not blocks:
+        return np.empty(0, dtype=dtype)
+    return blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+
+
+def compile_preset(preset, sample_rate, duration):
+    """
+    Compile a subtractive preset into a render plan.
+
+    Plans are cached on the preset contents (its name is ignored), the sample
+    rate and the duration, so recompiling unchanged settings is a dict lookup.
+    """
+    settings = {key: value for key, value in preset.items() if key != "name"}
+    return _compile(json.dumps(settings, sort_keys=True), sample_rate, float(duration))
+
+
+@lru_cache(maxsize=64)
+def _compile(settings_json, sample_rate, duration):
+    preset = json.loads(settings_json)
+
+    # Group the LFOs by the parameter they modulate
+    lfos = {}
+    for lfo in preset.get("lfos", []):
+        node = LFONode(lfo["shape"], to_float(lfo["frequency"], 1.0), to_float(lfo["depth"], 0.0))
+        lfos.setdefault(lfo["target"], []).append(node)
+    modulations = tuple(ModulationNode(target, tuple(nodes)) for target, nodes in lfos.items())
+
+    oscillators = tuple(
+        OscillatorNode(
+            osc["type"],
+            to_float(osc["frequency"], 440.0),
+            to_float(osc["amplitude"], 0.5),
+            int(np.clip(to_float(osc.get("unison"), 1), 1, OscillatorNode.MAX_UNISON)),
+            to_float(osc.get("detune"), 0.0),
+            float(np.clip(to_float(osc.get("spread"), 0.0), 0.0, 1.0)),
+        )
+        for osc in preset.get("oscillators", [])
+    )
+
+    # Merge the FM edges per (source, target), dropping those to missing oscillators
+    depths = {}
+    for edge in preset.get("fm", []):
+        source, target = int(to_float(edge.get("source"), -1)), int(to_float(edge.get("target"), -1))
+        if 0 <= source < len(oscillators) and 0 <= target < len(oscillators):
+            depths[source, target] = depths.get((source, target), 0.0) + to_float(edge.get("depth"), 0.0)
+    edges = tuple((source, target, depth) for (source, target), depth in sorted(depths.items()) if depth)
+    stages = fm_stages(oscillators, edges) if edges else ()
+    # Loops are evaluated a sample at a time with one voice per operator
+    looped = {index for stage in stages if stage.feedback for index in stage.operators}
+    oscillators = tuple(replace(osc, unison=1) if index in looped else osc for index, osc in enumerate(oscillators))
+    fm = FMNode(edges, stages)
+
+    filter_settings = tuple(
+        (filt["type"], to_float(filt["cutoff"], 1000.0), to_float(filt["resonance"], 1.0))
+        for filt in preset.get("filters", [])
+        if filt["type"] in IIR_FILTER_TYPES
+    )
+    fir_settings = tuple(
+        (to_float(filt["cutoff"], 1000.0), to_float(filt["resonance"], 1.0))
+        for filt in preset.get("filters", [])
+        if filt["type"] in FIR_FILTER_TYPES
+    )
+    if "Filter Cutoff" in lfos:
+        # Build the cutoff tables now so the first execution doesn't pay for them
+        for filter_type, _, resonance in filter_settings:
+            coefficient_table(filter_type, resonance if filter_type in ("Band-pass", "Band-reject") else 0.0, sample_rate)
+        filter_node = FilterNode(filter_settings, modulated=True, fir=fir_settings)
+    else:
+        sections = [design_sos(*settings, sample_rate) for settings in filter_settings]
+        sos = np.vstack(sections) if sections else np.empty((0, 6))
+        sos.flags.writeable = False
+        filter_node = FilterNode(filter_settings, modulated=False, sos=sos, fir=fir_settings)
+
+    effects = tuple(
+        EffectNode(effect["type"], tuple(sorted(effect.get("params", {}).items())))
+        for effect in preset.get("effects", [])
+    )
+
+    return RenderPlan(
+        sample_rate=sample_rate,
+        num_samples=int(sample_rate * duration),
+        volume=to_float(preset.get("volume"), 0.5),
+        modulations=modulations,
+        oscillators=oscillators,
+        fm=fm,
+        filter=filter_node,
+        effects=effects,
+    )
@@ -0,0 +1,142 @@
+"""
+Streaming polyphase sample-rate conversion.
+
+The engine renders at its own rate (32768 Hz by default), but most audio
+devices run at 44100 or 48000 Hz, and exports may ask for any rate.
+Resampler converts a stream by a rational factor up / down. It uses a
+Kaiser-windowed sinc lowpass split into `up` polyphase branches, so each
+output sample costs one short dot product. Filter banks are cached per
+conversion ratio, and the converter keeps its input history between
+blocks, so it works on a real-time stream as well as on a whole render.
+"""
+from functools import lru_cache
+from math import gcd
+import numpy as np
+
+
+TAPS_PER_PHASE = 32
+
+
+@lru_cache(maxsize=16)
+def polyphase_bank(up, down, taps_per_phase=TAPS_PER_PHASE, beta=8.0):
+    """
+    Design the polyphase filter bank for converting by up / down.
+
+    The prototype lowpass runs at up times the input rate and cuts off just
+    below the lower of the two Nyquist frequencies. Row p of the bank holds
+    the taps p, p + up, p + 2 * up, ... of the prototype, scaled by up to make
+    up for the zeros inserted between input samples.
+
+    Returns:
+        tuple: (bank, delay) where bank is a read-only (up, taps) array and
+            delay is the prototype's centre tap.
+    """
+    # Keep the transition band the same width, relative to the output, when decimating
+    taps = int(np.ceil(taps_per_phase * max(1.0, down / up)))
+    length = taps * up
+    delay = (length - 1) // 2
+    cutoff = 0.5 / max(up, down) * 0.95  # In cycles per sample at the upsampled rate
+
+    offsets = np.arange(length) - delay
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * offsets)
+    window = np.zeros(length)
+    window[:2 * delay + 1] = np.kaiser(2 * delay + 1, beta)
+    prototype *= window
+    prototype *= up / prototype.sum()
+
+    bank = prototype.reshape(taps, up).T.copy()
+    bank.flags.writeable = False
+    return bank, delay
+
+
+class Resampler:
+    """
+    Converts a stream from one sample rate to another.
+
+    process() returns every output sample whose input has arrived, so output
+    blocks don't line up with input blocks; flush() returns the rest once
+    the input has ended. The output is aligned with the input, with no
+    delay, and a stream of n input samples gives ceil(n * to_rate / from_rate)
+    output samples.
+    """
+
+    def __init__(self, from_rate, to_rate, dtype=float, chunk_size=8192):
+        """
+        Args:
+            from_rate (int): Input sample rate in Hz.
+            to_rate (int): Output sample rate in Hz.
+            dtype: Sample dtype of the output.
+            chunk_size (int): Output samples computed per vectorized step.
+        """
+        divisor = gcd(int(from_rate), int(to_rate))
+        self.up = int(to_rate) // divisor
+        self.down = int(from_rate) // divisor
+        self.bank, self.delay = polyphase_bank(self.up, self.down)
+        self.taps = self.bank.shape[1]
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.reset()
+
+    def reset(self):
+        """Clear the input history and restart the output clock."""
+        self.history = np.zeros(self.taps - 1, dtype=self.dtype)
+        self.consumed = 0  # Input samples received so far
+        self.produced = 0  # Output samples returned so far
+
+    def process(self, block):
+        """Convert one block, returning the output samples it completes."""
+        total = self.consumed + len(block)
+        line = np.concatenate((self.history, block))
+
+        # Output j sits at upsampled position j * down + delay, and needs the
+        # input up to index (j * down + delay) // up
+        end = max(self.produced, (total * self.up - 1 - self.delay) // self.down + 1)
+        output = np.empty(end - self.produced, dtype=self.dtype)
+        taps = np.arange(self.taps)
+        for start in range(0, len(output), self.chunk_size):
+            positions = np.arange(self.produced + start, min(self.produced + start + self.chunk_size, end)) * self.down + self.delay
+            newest = positions // self.up - self.consumed + self.taps - 1  # Index in line
+            window = line[newest[:, None] - taps]
+            output[start:start + len(positions)] = np.einsum("ij,ij->i", self.bank[positions % self.up], window)
+
+        self.history = line[len(line) - (self.taps - 1):]
+        self.consumed = total
+        self.produced = end
+        return output
+
+    def flush(self):
+        """Get the output samples still waiting for look-ahead input, ending the stream."""
+        end = -(-self.consumed * self.up // self.down)
+        remaining = end - self.produced
+        output = self.process(np.zeros(self.delay // self.up + 2, dtype=self.dtype))
+        return output[:remaining]
+
+
+def resample_blocks(blocks, from_rate, to_rate, dtype=float):
+    """Convert a stream of blocks between sample rates, yielding blocks at the new rate."""
+    resampler = Resampler(from_rate, to_rate, dtype)
+    for block in blocks:
+        output = resampler.process(block)
+        if len(output):
+            yield output
+    tail = resampler.flush()
+    if len(tail):
+        yield tail
+
+
+def resample(waveform, from_rate, to_rate):
+    """Convert a whole waveform between sample rates."""
+    if int(from_rate) == int(to_rate):
+        return waveform
+    resampler = Resampler(from_rate, to_rate, waveform.dtype)
+    return np.concatenate((resampler.process(waveform), resampler.flush()))
+
+
+def device_sample_rate(default=None):
+    """Get the native sample rate of the default output device, or `default` if there isn't one."""
+    import sounddevice as sd  # Only the GUI plays audio, so the CLI doesn't need PortAudio
+
+    try:
+        return int(sd.query_devices(kind="output")["default_samplerate"])
+    except (sd.PortAudioError, ValueError):
+        return default
@@ -1,5 +1,7 @@
 import sqlite3
 
+from preset_store import migrate
+
 def create_dbs():
     """
     Create or update the database schema to ensure it matches the application's requirements.
@@ -84,6 +86,9 @@ def create_dbs():
         type TEXT NOT NULL,
         frequency REAL NOT NULL,
         amplitude REAL NOT NULL,
+        unison INTEGER NOT NULL DEFAULT 1,
+        detune REAL NOT NULL DEFAULT 0,
+        spread REAL NOT NULL DEFAULT 0,
         FOREIGN KEY (Sid) REFERENCES SubtractivePresets(Sid) ON DELETE CASCADE
     );
     CREATE TABLE IF NOT EXISTS SubtractivePresetLFOs (
@@ -98,6 +103,8 @@ def create_dbs():
 
     """
     cursor.executescript(create_tables)
+    # Tables created by an older version keep their columns, so add the new ones (and the FM table)
+    migrate(connection)
 
     cursor.execute("""
         CREATE VIEW IF NOT EXISTS CommunityPresetsView AS
@@ -113,7 +120,9 @@ def create_dbs():
         ("Bitcrusher", "Reduces the bit depth and sample rate for distortion"),
         ("Ring Modulation", "Multiplies the waveform with a modulating frequency"),
         ("Phaser", "Creates a sweeping phase effect"),
-        ("Wavefolder", "Adds harmonic complexity through wavefolding")
+        ("Wavefolder", "Adds harmonic complexity through wavefolding"),
+        ("Convolution Reverb", "Places the sound in a space recorded as an impulse response"),
+        ("Algorithmic Reverb", "Adds a reverb tail from a network of feedback delay lines")
     ]
     cursor.executemany("INSERT OR IGNORE INTO Effects (name, description) VALUES (?, ?)", predefined_effects)
 
@@ -3,13 +3,20 @@ import numpy as np
 import sounddevice as sd
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
-from scipy.signal import butter, lfilter, sosfilt
 from threading import Timer
-from tkinter import simpledialog, messagebox
+from tkinter import simpledialog, messagebox, filedialog
+import os
 import threading
 
 from tooltips import Tooltip
 from utils import ScrollableFrame
+from filters import FILTER_TYPES
+from effects import EFFECT_TYPES, OVERSAMPLED_EFFECTS
+from oversampling import OVERSAMPLING_FACTORS
+from buffers import BufferArena
+from engine import compile_subtractive
+from render_cache import get_cache
+from resampler import device_sample_rate, resample
 
 
 
@@ -30,6 +37,10 @@ class SubtractiveSynth:
         self.filter = Filter(sample_rate, on_change_callback=self.update_graphs)
         self.effect = Effect(sample_rate, on_change_callback=self.update_graphs)
         self.lfo = LFO(sample_rate, on_change_callback=self.update_graphs)
+        self.fm_matrix = FMMatrix(sample_rate, on_change_callback=self.update_graphs)
+
+        # Scratch buffers reused by every render
+        self.arena = BufferArena()
 
         # Parameters
         self.volume = 0.5
@@ -91,6 +102,11 @@ class SubtractiveSynth:
         )
         self.add_oscillator_button.pack(pady=10)
 
+        # FM Matrix Controls
+        ctk.CTkLabel(self.scrollable_frame, text="FM Matrix", font=("Arial", 16)).pack(pady=5)
+        self.fm_matrix_frame = ctk.CTkFrame(self.scrollable_frame)
+        self.fm_matrix_frame.pack(pady=10, fill="both", expand=True)
+
         # Filter Controls
         ctk.CTkLabel(self.scrollable_frame, text="Filters", font=("Arial", 16)).pack(pady=5)
         self.filters_frame = ctk.CTkFrame(self.scrollable_frame)
@@ -149,44 +165,6 @@ class SubtractiveSynth:
         )
         self.play_button.pack(side="bottom", pady=10)
 
-    def update_graphs(self):
-        #Regenerate and redraw the waveform and filter graphs.
-        waveform = self.generate_waveform()
-        filtered_waveform = self.apply_filters(waveform)
-
-        # Display a single wavelength or a few cycles for clarity
-        max_cycles = 5
-        t = np.linspace(0, self.duration, len(waveform), endpoint=False)
-        # Calculate the cycles for displaying the waveform graph
-        try:
-            max_freq = max(
-                [float(osc["frequency"].get()) for osc in self.oscillator.oscillators if osc["frequency"].get().strip()]
-                + [1]
-            )
-        except ValueError:
-            max_freq = 1  # Fallback in case all frequencies are invalid
-        cycles = int(self.sample_rate / max_freq)
-
-        end_index = min(max_cycles * cycles, len(t))
-
-        # Update Waveform Graph
-        self.wave_ax.clear()
-        self.wave_ax.plot(t[:end_index], waveform[:end_index], label="Raw Waveform", alpha=0.7)
-        self.wave_ax.set_title("Waveform")
-        self.wave_ax.legend()
-        self.wave_ax.grid(True)
-
-        # Update Filter Graph
-        self.filter_ax.clear()
-        self.filter_ax.plot(t[:end_index], filtered_waveform[:end_index], label="Filtered Waveform")
-        self.filter_ax.set_title("Filter Output")
-        self.filter_ax.legend()
-        self.filter_ax.grid(True)
-
-        # Refresh Canvas
-        self.canvas.draw()
-
-
     def debounced_update(self, *args):
         """Faster debounced updates for graphs"""
         # Cancel any pending updates
@@ -197,8 +175,10 @@ class SubtractiveSynth:
         self._update_timer = self.after(100, self.update_graphs)
     def update_graphs(self):
         """Regenerate and redraw the waveform and filter graphs."""
-        waveform = self.generate_waveform()
-        filtered_waveform = self.filter.apply_filters(waveform)
+        self.fm_matrix.sync(self.fm_matrix_frame, self.oscillator.oscillators)
+        plan = self.compile_plan()
+        waveform = plan.render_oscillators(self.arena)
+        filtered_waveform = plan.apply_filters(waveform, self.arena)
 
         # Display a single wavelength or a few cycles for clarity
         max_cycles = 5
@@ -234,51 +214,14 @@ class SubtractiveSynth:
         self.canvas.draw()
 
 
-    def generate_waveform(self):
-        """Generate waveform with LFO-modulated parameters."""
+    def compile_plan(self):
+        """Compile the current settings into a render plan that no longer reads the widgets."""
         duration = float(self.duration_entry.get())  # Get duration from the input field
-        t = np.linspace(0, duration, int(self.sample_rate * duration), endpoint=False)
-        waveform = np.zeros_like(t)
+        return compile_subtractive(self.get_preset_data(self.loaded_preset_name), self.sample_rate, duration)
 
-        for osc in self.oscillator.oscillators:
-            # Extract oscillator parameters
-            waveform_type = osc["type"].get()
-            try:
-                base_freq = float(osc["frequency"].get())
-            except ValueError:
-                base_freq = 440.0  # Default frequency if invalid
-            base_amp = osc["amplitude"].get()
-
-            # Apply LFO to frequency
-            freq_modulation = self.lfo.apply_lfo("Frequency", t)
-            modulated_freq = base_freq * (1 + freq_modulation * 0.5)  # ±50% swing
-            modulated_freq = np.clip(modulated_freq, 20, self.sample_rate / 2)  # Clamp frequency
-
-            # Apply LFO to amplitude
-            amp_modulation = self.lfo.apply_lfo("Amplitude", t)
-            modulated_amp = base_amp * (1 + amp_modulation * 0.5)  # ±50% swing
-            modulated_amp = np.clip(modulated_amp, 0.0, 1.0)  # Clamp amplitude
-
-            # Calculate instantaneous phase for frequency modulation
-            phase = np.cumsum(modulated_freq) * (2 * np.pi / self.sample_rate)
-
-            # Generate waveform
-            if waveform_type == "Sine":
-                waveform += modulated_amp * np.sin(phase)
-            elif waveform_type == "Square":
-                waveform += modulated_amp * np.sign(np.sin(phase))
-            elif waveform_type == "Sawtooth":
-                waveform += modulated_amp * (2 * (phase / (2 * np.pi) % 1) - 1)
-            elif waveform_type == "Triangle":
-                waveform += modulated_amp * (2 * np.abs(2 * (phase / (2 * np.pi) % 1) - 1))
-
-        # Normalize waveform
-        max_val = np.max(np.abs(waveform))
-        if max_val > 0:
-            waveform = waveform / max_val
-
-        # Apply master volume
-        return waveform * self.volume_slider.get()
+    def generate_waveform(self):
+        """Generate waveform with LFO-modulated parameters."""
+        return self.compile_plan().render_oscillators(self.arena)
 
     def save_current_preset(self):
         """Save the current settings, checking for overwrite and pre-filling the preset name."""
@@ -313,8 +256,11 @@ class SubtractiveSynth:
             "oscillators": [
                 {
                     "type": osc["type"].get(),
-                    "frequency": float(osc["frequency"].get()),
+                    "frequency": self.oscillator.read_frequency(osc),
                     "amplitude": osc["amplitude"].get(),
+                    "unison": int(round(osc["unison"].get())),
+                    "detune": osc["detune"].get(),
+                    "spread": osc["spread"].get(),
                 }
                 for osc in self.oscillator.oscillators
             ],
@@ -345,6 +291,7 @@ class SubtractiveSynth:
                 }
                 for lfo in self.lfo.lfos
             ],
+            "fm": self.fm_matrix.get_edges(self.oscillator.oscillators),
         }
 
     def load_preset(self, preset_data):
@@ -371,9 +318,15 @@ class SubtractiveSynth:
                 self.oscillators_frame,  # Pass the oscillators_frame
                 osc["type"],  # Oscillator type
                 osc["frequency"],  # Frequency
-                osc["amplitude"]  # Amplitude
+                osc["amplitude"],  # Amplitude
+                osc.get("unison", 1),  # Unison voices
+                osc.get("detune", 0.0),  # Detune
+                osc.get("spread", 0.0)  # Phase spread
             )
 
+        # Load the FM matrix onto the new oscillators
+        self.fm_matrix.load(self.fm_matrix_frame, self.oscillator.oscillators, preset_data.get("fm", []))
+
         # Load filters
         for filt in self.filter.filters:
             filt["frame"].destroy()
@@ -417,17 +370,17 @@ class SubtractiveSynth:
 
 
     def play_sound(self):
-        """Play the generated waveform with effects."""
-        waveform = self.generate_waveform()
-        waveform = self.filter.apply_filters(waveform)
-        waveform = self.effect.apply_effects(waveform)
-        
-        # Normalize the waveform
-        max_val = np.max(np.abs(waveform))
-        if max_val > 0:
-            waveform = waveform / max_val
-            
-        threading.Thread(target=lambda: sd.play(waveform, samplerate=self.sample_rate),daemon=True).start()
+        """Play the generated waveform with effects, at the output device's native rate."""
+        # Read the widgets here; the render (or cache lookup) runs on the worker thread
+        preset_data = self.get_preset_data(self.loaded_preset_name)
+        duration = float(self.duration_entry.get())
+
+        def play():
+            waveform = get_cache().render(preset_data, self.sample_rate, duration)
+            device_rate = device_sample_rate(self.sample_rate)
+            sd.play(resample(waveform, self.sample_rate, device_rate), samplerate=device_rate)
+
+        threading.Thread(target=play, daemon=True).start()
 
 
 class Oscillator:
@@ -436,7 +389,7 @@ class Oscillator:
         self.oscillators = []  # List to store active oscillators
         self.on_change_callback = on_change_callback
 
-    def add_oscillator(self, oscillators_frame, osc_type="Sine", frequency=440.0, amplitude=0.5):
+    def add_oscillator(self, oscillators_frame, osc_type="Sine", frequency=440.0, amplitude=0.5, unison=1, detune=20.0, spread=1.0):
         """Add a new oscillator to the oscillators chain."""
         osc_frame = ctk.CTkFrame(oscillators_frame)
         osc_frame.pack(fill="x", pady=5)
@@ -466,9 +419,30 @@ class Oscillator:
         amp_slider.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
         Tooltip(amp_slider, "Set the amplitude (volume) of this oscillator.")
 
+        # Unison voices slider
+        ctk.CTkLabel(osc_frame, text="Unison Voices").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        unison_slider = ctk.CTkSlider(osc_frame, from_=1, to=16, number_of_steps=15, command=lambda _: self.notify_change())
+        unison_slider.set(unison)
+        unison_slider.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
+        Tooltip(unison_slider, "Stack detuned copies of this oscillator; 7 voices of a sawtooth make a supersaw.")
+
+        # Detune slider
+        ctk.CTkLabel(osc_frame, text="Detune (cents)").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        detune_slider = ctk.CTkSlider(osc_frame, from_=0.0, to=100.0, command=lambda _: self.notify_change())
+        detune_slider.set(detune)
+        detune_slider.grid(row=4, column=1, padx=5, pady=5, sticky="ew")
+        Tooltip(detune_slider, "Set how far apart the lowest and highest unison voices are tuned.")
+
+        # Spread slider
+        ctk.CTkLabel(osc_frame, text="Phase Spread").grid(row=5, column=0, padx=5, pady=5, sticky="w")
+        spread_slider = ctk.CTkSlider(osc_frame, from_=0.0, to=1.0, command=lambda _: self.notify_change())
+        spread_slider.set(spread)
+        spread_slider.grid(row=5, column=1, padx=5, pady=5, sticky="ew")
+        Tooltip(spread_slider, "Stagger the start phases of the unison voices, softening the attack.")
+
         # Remove button
         remove_button = ctk.CTkButton(osc_frame, text="Remove", command=lambda: self.remove_oscillator(osc_frame))
-        remove_button.grid(row=3, column=0, columnspan=2, pady=5)
+        remove_button.grid(row=6, column=0, columnspan=2, pady=5)
         Tooltip(remove_button, "Remove this oscillator.")
 
         # Add oscillator to the list
@@ -477,9 +451,20 @@ class Oscillator:
             "type": type_menu,
             "frequency": freq_entry,
             "amplitude": amp_slider,
+            "unison": unison_slider,
+            "detune": detune_slider,
+            "spread": spread_slider,
         })
         self.notify_change()
 
+    @staticmethod
+    def read_frequency(osc):
+        """Read an oscillator's frequency entry, defaulting to 440 Hz if it isn't a number."""
+        try:
+            return float(osc["frequency"].get())
+        except ValueError:
+            return 440.0
+
     def remove_oscillator(self, osc_frame):
         """Remove an oscillator from the oscillators chain."""
         for osc in self.oscillators:
@@ -496,6 +481,85 @@ class Oscillator:
             self.on_change_callback()
 
 
+class FMMatrix:
+    def __init__(self, sample_rate, on_change_callback=None):
+        self.sample_rate = sample_rate
+        self.depths = {}  # (modulator frame, carrier frame) -> depth in radians
+        self.frames = []  # Oscillator frames the grid was last built for
+        self.on_change_callback = on_change_callback
+
+    def sync(self, matrix_frame, oscillators):
+        """Rebuild the grid of depth entries if oscillators were added or removed."""
+        frames = [osc["frame"] for osc in oscillators]
+        if frames == self.frames:
+            return
+        self.frames = frames
+        # Drop the depths of removed oscillators
+        self.depths = {key: depth for key, depth in self.depths.items() if key[0] in frames and key[1] in frames}
+
+        for widget in matrix_frame.winfo_children():
+            widget.destroy()
+        if not frames:
+            ctk.CTkLabel(matrix_frame, text="Add oscillators to modulate them").grid(row=0, column=0, padx=5, pady=5)
+            return
+
+        # One row per modulator, one column per carrier
+        ctk.CTkLabel(matrix_frame, text="Mod \\ Carrier").grid(row=0, column=0, padx=5, pady=5)
+        for index in range(len(frames)):
+            ctk.CTkLabel(matrix_frame, text=f"Osc {index + 1}").grid(row=0, column=index + 1, padx=2, pady=5)
+            ctk.CTkLabel(matrix_frame, text=f"Osc {index + 1}").grid(row=index + 1, column=0, padx=5, pady=2, sticky="w")
+
+        for row, modulator in enumerate(frames):
+            for column, carrier in enumerate(frames):
+                entry = ctk.CTkEntry(matrix_frame, width=50)
+                entry.insert(0, str(self.depths.get((modulator, carrier), 0.0)))
+                entry.grid(row=row + 1, column=column + 1, padx=2, pady=2)
+                update = lambda _, key=(modulator, carrier), entry=entry: self.update_depth(key, entry)
+                entry.bind("<FocusOut>", update)
+                entry.bind("<Return>", update)
+                Tooltip(entry, f"How far (radians) Osc {row + 1} bends the phase of Osc {column + 1}. "
+                               "An oscillator with amplitude 0 is only heard through what it modulates.")
+
+    def update_depth(self, key, entry):
+        """Store a depth typed into the grid, ignoring anything that isn't a number."""
+        try:
+            depth = float(entry.get())
+        except ValueError:
+            return
+        if depth == self.depths.get(key, 0.0):
+            return
+        if depth:
+            self.depths[key] = depth
+        else:
+            self.depths.pop(key, None)
+        self.notify_change()
+
+    def get_edges(self, oscillators):
+        """Get the matrix as {"source", "target", "depth"} edges between oscillator indices."""
+        index = {osc["frame"]: position for position, osc in enumerate(oscillators)}
+        return [
+            {"source": index[modulator], "target": index[carrier], "depth": depth}
+            for (modulator, carrier), depth in self.depths.items()
+            if modulator in index and carrier in index
+        ]
+
+    def load(self, matrix_frame, oscillators, edges):
+        """Set the matrix from a preset's edges and rebuild the grid."""
+        frames = [osc["frame"] for osc in oscillators]
+        self.depths = {
+            (frames[edge["source"]], frames[edge["target"]]): float(edge["depth"])
+            for edge in edges
+            if 0 <= edge["source"] < len(frames) and 0 <= edge["target"] < len(frames) and float(edge["depth"])
+        }
+        self.frames = None  # Force the grid to be rebuilt
+        self.sync(matrix_frame, oscillators)
+
+    def notify_change(self):
+        """Notify the parent class (SubtractiveSynth) that a change has occurred."""
+        if self.on_change_callback:
+            self.on_change_callback()
+
+
 
 
 class Filter:
@@ -513,7 +577,7 @@ class Filter:
         ctk.CTkLabel(filter_frame, text="Type").grid(row=0, column=0, padx=5, pady=5, sticky="w")
         type_menu = ctk.CTkComboBox(
             filter_frame,
-            values=["Low-pass", "High-pass", "Band-pass", "Band-reject"],
+            values=FILTER_TYPES,
             command=lambda value: self.update_filter_ui(value, filter_frame)
         )
         type_menu.set(filter_type)
@@ -565,7 +629,8 @@ class Filter:
             "Low-pass": "Allows frequencies below the cutoff to pass, attenuating higher frequencies.",
             "High-pass": "Allows frequencies above the cutoff to pass, attenuating lower frequencies.",
             "Band-pass": "Allows frequencies within a specific range to pass, attenuating others.",
-            "Band-reject": "Attenuates frequencies within a specific range, allowing others to pass."
+            "Band-reject": "Attenuates frequencies within a specific range, allowing others to pass.",
+            "Linear-phase FIR": "A steep low-pass filter that delays every frequency equally, so it doesn't smear transients."
         }
         if hasattr(self, "filter_type_tooltip"):
             self.filter_type_tooltip.update_text(filter_type_tooltips.get(filter_type, "Select the type of filter to apply."))
@@ -587,6 +652,10 @@ class Filter:
             "Band-reject": {
                 "frequency": "Set the center frequency for the band-reject filter (attenuates frequencies around this value).",
                 "resonance": "Set the resonance (emphasis) for the band-reject filter."
+            },
+            "Linear-phase FIR": {
+                "frequency": "Set the cutoff frequency for the linear-phase low-pass filter.",
+                "resonance": "Set the steepness of the linear-phase filter; higher values use a longer filter."
             }
         }
 
@@ -598,48 +667,6 @@ class Filter:
                 elif "Resonance" in str(widget):
                     Tooltip(widget, filter_tooltips[filter_type]["resonance"])
 
-    def apply_filters(self, waveform):
-        """Apply the active filters to the waveform."""
-        for filter_ in self.filters:
-            filter_type = filter_["type"].get()
-            freq = filter_["frequency"].get()
-            res = filter_["resonance"].get()
-            if filter_type == "Low-pass":
-                waveform = self.lowpass_filter(waveform, freq, res)
-            elif filter_type == "High-pass":
-                waveform = self.highpass_filter(waveform, freq, res)
-            elif filter_type == "Band-pass":
-                waveform = self.bandpass_filter(waveform, freq, res)
-            elif filter_type == "Band-reject":
-                waveform = self.band_reject_filter(waveform, freq, res)
-        return waveform
-
-    def lowpass_filter(self, waveform, cutoff, resonance):
-        nyquist = 0.5 * self.sample_rate
-        normal_cutoff = cutoff / nyquist
-        b, a = butter(N=2, Wn=normal_cutoff, btype="low")
-        return lfilter(b, a, waveform)
-
-    def highpass_filter(self, waveform, cutoff, resonance):
-        nyquist = 0.5 * self.sample_rate
-        normal_cutoff = cutoff / nyquist
-        b, a = butter(N=2, Wn=normal_cutoff, btype="high")
-        return lfilter(b, a, waveform)
-
-    def bandpass_filter(self, waveform, cutoff, resonance):
-        nyquist = 0.5 * self.sample_rate
-        low = max(0.01, (cutoff - resonance) / nyquist)
-        high = min(1.0, (cutoff + resonance) / nyquist)
-        b, a = butter(N=2, Wn=[low, high], btype="band")
-        return lfilter(b, a, waveform)
-
-    def band_reject_filter(self, waveform, cutoff, resonance):
-        nyquist = 0.5 * self.sample_rate
-        low = max(0.01, (cutoff - resonance) / nyquist)
-        high = min(1.0, (cutoff + resonance) / nyquist)
-        b, a = butter(N=2, Wn=[low, high], btype="bandstop")
-        return lfilter(b, a, waveform)
-    
     def notify_change(self):
         """Notify the parent class (SubtractiveSynth) that a change has occurred."""
         if self.on_change_callback:
@@ -664,7 +691,7 @@ class Effect:
         ctk.CTkLabel(effect_frame, text="Type").grid(row=0, column=0, padx=5, pady=5, sticky="w")
         type_menu = ctk.CTkComboBox(
             effect_frame,
-            values=["Bitcrusher", "Ring Modulation", "Phaser", "Flanger", "Wavefolder", "Chorus"],
+            values=EFFECT_TYPES,
             command=lambda value: self.update_effect_ui(value, params_frame, params or {}, type_menu)
         )
         type_menu.set(effect_type)
@@ -727,6 +754,7 @@ class Effect:
             "Flanger": [
                 ("Max Delay (ms)", "max_delay", 1, 20, 1, "Set the maximum delay time for the flanger effect."),
                 ("Rate (Hz)", "rate", 0.1, 2.0, 0.1, "Set the rate of the flanger modulation."),
+                ("Feedback", "feedback", 0.0, 0.9, 0.1, "Set how much of the delayed signal is fed back into the flanger."),
             ],
             "Wavefolder": [
                 ("Threshold", "threshold", 0.1, 1.0, 0.1, "Set the threshold for wavefolding distortion."),
@@ -735,6 +763,16 @@ class Effect:
                 ("Detune Amount", "detune", 0.01, 0.1, 0.01, "Set the amount of detuning for the chorus effect."),
                 ("Delay (ms)", "delay", 1, 20, 1, "Set the delay time for the chorus effect."),
                 ("Voices", "voices", 2, 8, 1, "Set the number of voices for the chorus effect."),
+            ],
+            "Convolution Reverb": [
+                ("Mix", "mix", 0.0, 1.0, 0.05, "Set the balance between the dry and the reverberated sound."),
+            ],
+            "Algorithmic Reverb": [
+                ("Decay (s)", "decay", 0.1, 10.0, 0.1, "Set how long the reverb tail takes to die away."),
+                ("Size", "size", 0.5, 2.0, 0.1, "Set the size of the simulated room."),
+                ("Damping", "damping", 0.0, 0.9, 0.1, "Set how much faster high frequencies die away than low ones."),
+                ("Mix", "mix", 0.0, 1.0, 0.05, "Set the balance between the dry and the reverberated sound."),
+                ("Delay Lines", "lines", 8, 16, 8, "Use 16 delay lines for a denser tail, at twice the CPU cost."),
             ]
         }
 
@@ -752,135 +790,45 @@ class Effect:
             slider.configure(command=lambda _, key=param_key, s=slider: params.update({key: s.get()}))
             params[param_key] = slider.get()
 
-        params_frame.update_idletasks()
-
-    def apply_effects(self, waveform):
-        """Apply the chain of effects to the waveform."""
-        processed_waveform = waveform.copy()
-
-        for effect in self.effects:
-            effect_type = effect["type"].get()  # Get the selected effect type
-
-            # Retrieve parameter values (call getter if callable, otherwise use the value directly)
-            params = {
-                key: getter() if callable(getter) else getter
-                for key, getter in effect["params"].items()
-            }
-
-
-
-            # Apply the selected effect
-            if effect_type == "Bitcrusher":
-                processed_waveform = self.bitcrusher_effect(processed_waveform, params)
-            elif effect_type == "Ring Modulation":
-                processed_waveform = self.ring_modulation_effect(processed_waveform, params)
-            elif effect_type == "Phaser":
-                processed_waveform = self.phaser_effect(processed_waveform, params)
-            elif effect_type == "Flanger":
-                processed_waveform = self.flanger_effect(processed_waveform, params)
-            elif effect_type == "Wavefolder":
-                processed_waveform = self.wavefolder_effect(processed_waveform, params)
-            elif effect_type == "Chorus":
-                processed_waveform = self.chorus_effect(processed_waveform, params)
-
-        return processed_waveform
-
-    def bitcrusher_effect(self, waveform, params):
-        """Apply a bitcrusher effect."""
-        bit_depth = int(params.get("bit_depth", 8))  #  Ensure int type
-        sample_rate_reduction = int(params.get("sample_rate_reduction", 4))  #  Ensure int type
-
-        # Quantize the signal
-        quantized_waveform = np.round(waveform * (2**(bit_depth - 1))) / (2**(bit_depth - 1))
-
-        # Downsample the signal (Fix slice index issue)
-        downsampled_waveform = quantized_waveform[::sample_rate_reduction]  #  Ensure int index
-        return np.repeat(downsampled_waveform, sample_rate_reduction)[:len(waveform)]
-
-
-
-    def ring_modulation_effect(self, waveform, params):
-        """Apply ring modulation."""
-        mod_freq = params.get("mod_freq", 100)  # Frequency of the modulator
-        t = np.linspace(0, self.duration, len(waveform), endpoint=False)
-
-        # Multiply the signal by a modulating sine wave
-        modulator = np.sin(2 * np.pi * mod_freq * t)
-        return waveform * modulator
-
-
-
-    def phaser_effect(self, waveform, params):
-        """Apply a phaser effect."""
-        num_stages = int(params.get("num_stages", 4))  # Ensure num_stages is an integer
-        sweep_freq = params.get("sweep_freq", 0.5)
-        depth = params.get("depth", 0.5)
-
-        t = np.linspace(0, self.duration, len(waveform), endpoint=False)
-        lfo = depth * np.sin(2 * np.pi * sweep_freq * t)
-
-        phaser_waveform = waveform.copy()
-        for _ in range(num_stages):
-            # Ensure cutoff frequency is within valid bounds
-            cutoff = 500 + 1000 * lfo
-            cutoff = np.clip(cutoff, 20, self.sample_rate / 2 - 1)  # Clamp cutoff frequency
-            sos = butter(2, cutoff / (self.sample_rate / 2), btype='bandpass', output='sos')
-            phaser_waveform = sosfilt(sos, phaser_waveform)
-        return phaser_waveform
-
-
-        
-    def wavefolder_effect(self, waveform, params):
-        """Apply wavefolding distortion."""
-        threshold = params.get("threshold", 0.5)  # Folding threshold
-        folded_waveform = np.abs(waveform)  # Start by folding negative values
-        folded_waveform[folded_waveform > threshold] = 2 * threshold - folded_waveform[folded_waveform > threshold]
-        return folded_waveform
-
-    def flanger_effect(self, waveform, params):
-        """Apply a flanger effect."""
-        max_delay = int(params.get("max_delay", 0.005) * self.sample_rate)  # Max delay in samples
-        rate = params.get("rate", 0.25)  # LFO rate for modulation
-
-        t = np.linspace(0, self.duration, len(waveform), endpoint=False)
-        lfo = max_delay * (1 + np.sin(2 * np.pi * rate * t)) / 2  # Modulate delay
-
-        flanged_waveform = waveform.copy()
-        for i in range(len(waveform)):
-            delay = int(lfo[i])
-            if i >= delay:
-                flanged_waveform[i] += waveform[i - delay]
-        return flanged_waveform / 2  # Normalize
-    
-
-    def chorus_effect(self, waveform, params):
-        """Apply a chorus effect by layering detuned waveforms."""
-        detune = params.get("detune", 0.02)
-        delay = int(params.get("delay", 0.005) * self.sample_rate)
-        num_voices = int(params.get("voices", 3))  # Ensure num_voices is an integer
-
-        chorus_wave = waveform.copy()
-        for i in range(num_voices):
-            detune_factor = 1 + detune * (-1 if i % 2 == 0 else 1)  # Alternate detuning up and down
-
-            # Generate detuned waveform
-            detuned_wave = np.interp(
-                np.linspace(0, len(waveform), int(len(waveform) * detune_factor)),
-                np.arange(len(waveform)),
-                waveform,
+        if effect_type in OVERSAMPLED_EFFECTS:
+            row = len(effect_parameters[effect_type])
+            ctk.CTkLabel(params_frame, text="Oversampling").grid(row=row, column=0, padx=5, pady=5, sticky="w")
+            oversampling_menu = ctk.CTkComboBox(
+                params_frame,
+                values=[f"{factor}x" for factor in OVERSAMPLING_FACTORS],
+                command=lambda value: params.update({"oversampling": int(value.rstrip("x"))})
             )
+            params["oversampling"] = int(params.get("oversampling", 1))
+            oversampling_menu.set(f"{params['oversampling']}x")
+            oversampling_menu.grid(row=row, column=1, padx=5, pady=5, sticky="ew")
+            Tooltip(oversampling_menu, "Run the effect at a higher sample rate to reduce aliasing, at the cost of CPU time.")
+        else:
+            params.pop("oversampling", None)
+
+        if effect_type == "Convolution Reverb":
+            row = len(effect_parameters[effect_type])
+            params.setdefault("ir_path", "")
+            ir_label = ctk.CTkLabel(params_frame, text=os.path.basename(params["ir_path"]) or "No impulse response")
+            ir_label.grid(row=row, column=1, padx=5, pady=5, sticky="w")
+            ir_button = ctk.CTkButton(
+                params_frame,
+                text="Load IR...",
+                command=lambda: self.load_impulse_response(params, ir_label)
+            )
+            ir_button.grid(row=row, column=0, padx=5, pady=5, sticky="w")
+            Tooltip(ir_button, "Choose a WAV file with the impulse response of the space to place the sound in.")
+        else:
+            params.pop("ir_path", None)
 
-            # Match length of detuned_wave to the original waveform
-            if len(detuned_wave) > len(waveform):
-                detuned_wave = detuned_wave[:len(waveform)]
-            elif len(detuned_wave) < len(waveform):
-                detuned_wave = np.pad(detuned_wave, (0, len(waveform) - len(detuned_wave)), mode="constant")
-
-            # Add delayed detuned wave
-            delayed_wave = np.pad(detuned_wave, (delay * i, 0), mode="constant")[:len(waveform)]
-            chorus_wave += delayed_wave
+        params_frame.update_idletasks()
 
-        return chorus_wave / (num_voices + 1)  # Normalize output
+    def load_impulse_response(self, params, ir_label):
+        """Ask for an impulse response file for a convolution reverb."""
+        path = filedialog.askopenfilename(filetypes=[("WAV files", "*.wav")])
+        if path:
+            params["ir_path"] = path
+            ir_label.configure(text=os.path.basename(path))
+            self.notify_change()
 
     def notify_change(self):
         """Notify the parent class (SubtractiveSynth) that a change has occurred."""
@@ -931,7 +879,7 @@ class LFO:
         ctk.CTkLabel(lfo_frame, text="Target").grid(row=3, column=0, padx=5, pady=5, sticky="w")
         target_menu = ctk.CTkComboBox(
             lfo_frame,
-            values=["Frequency", "Amplitude"],
+            values=["Frequency", "Amplitude", "Filter Cutoff"],
             command=lambda _: self.notify_change()
         )
         target_menu.set(target)
@@ -964,32 +912,6 @@ class LFO:
 
         self.notify_change()
 
-    def apply_lfo(self, target, t):
-        """Apply LFO modulation to the specified parameter."""
-        modulation = np.zeros_like(t)
-        for lfo in self.lfos:
-            if lfo["target"].get() != target:
-                continue
-
-            # Get LFO parameters
-            shape = lfo["shape"].get()
-            freq = float(lfo["frequency"].get())  # Frequency of the LFO itself
-            depth = lfo["depth"].get()  # Depth of modulation (scales -1 to 1 range)
-
-            # Generate modulation signal
-            if shape == "Sine":
-                mod_signal = depth * np.sin(2 * np.pi * freq * t)
-            elif shape == "Square":
-                mod_signal = depth * np.sign(np.sin(2 * np.pi * freq * t))
-            elif shape == "Triangle":
-                mod_signal = depth * (2 * np.abs(2 * (t * freq - np.floor(t * freq + 0.5))) - 1)
-            elif shape == "Sawtooth":
-                mod_signal = depth * (2 * (t * freq - np.floor(t * freq)))
-
-            modulation += mod_signal  # Combine signals if multiple LFOs target the same parameter
-
-        return modulation
-    
     def notify_change(self):
         """Notify the parent class (SubtractiveSynth) that a change has occurred."""
         if self.on_change_callback:
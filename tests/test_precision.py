@@ -0,0 +1,45 @@
+"""
+Float32 accuracy of the render, checked against the float64 reference.
+
+Runs `python -m cli check-precision` over the reference presets, which
+cover every filter kind, effect, unison and FM, so a change that loses
+precision in any stage fails here.
+"""
+import numpy as np
+import pytest
+
+import cli
+import precision
+from engine import render
+from reference_presets import reference_presets, write_impulse_response
+
+
+MIN_SNR = 90.0
+
+
+@pytest.fixture(autouse=True)
+def keep_precision(monkeypatch):
+    """check-precision switches the global precision; restore it after each test."""
+    monkeypatch.setattr(precision, "_precision", precision.get_precision())
+
+
+@pytest.fixture(scope="module")
+def ir_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("ir") / "reference_ir.wav")
+    write_impulse_response(path)
+    return path
+
+
+def test_reference_presets_have_a_normal_level(ir_path):
+    # A nearly silent preset would pass the SNR bound without saying anything about accuracy
+    precision.set_precision("float64")
+    for preset_data in reference_presets(ir_path):
+        assert np.max(np.abs(render(preset_data))) > 0.1, preset_data["name"]
+
+
+def test_check_precision_passes_on_reference_presets(ir_path, capsys):
+    assert cli.main(["check-precision", "--min-snr", str(MIN_SNR)]) == 0
+    output = capsys.readouterr().out
+    count = len(reference_presets(ir_path))
+    assert "FAIL" not in output
+    assert f"{count} of {count} presets within {MIN_SNR} dB" in output
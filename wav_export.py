@@ -0,0 +1,159 @@
+"""
+Streaming WAV export.
+
+WavWriter writes the RIFF header up front with placeholder sizes, appends
+sample blocks as they arrive and patches the sizes when it's closed, so a
+render never has to fit in memory. export_wav() feeds it from the engine's
+block renderer, converting to another sample rate on the way if asked.
+"""
+import struct
+import time
+import numpy as np
+
+from engine import DEFAULT_SAMPLE_RATE, render_blocks
+from resampler import resample_blocks
+
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+# Sample format: (format tag, bits per sample)
+SAMPLE_FORMATS = {
+    "int16": (WAVE_FORMAT_PCM, 16),
+    "int24": (WAVE_FORMAT_PCM, 24),
+    "float32": (WAVE_FORMAT_IEEE_FLOAT, 32),
+}
+
+BLOCK_SIZE = 1 << 16
+
+
+class WavWriter:
+    """
+    Mono WAV file written block by block.
+
+    Integer formats are scaled to full range, with TPDF dither (the sum of
+    two uniform variables, one LSB wide each) added before rounding unless
+    dither is off. Use it as a context manager, or call close() to finish
+    the header.
+    """
+
+    def __init__(self, path, sample_rate, sample_format="float32", dither=True, seed=None):
+        """
+        Args:
+            path (str): File to write.
+            sample_rate (int): Sample rate in Hz.
+            sample_format (str): One of SAMPLE_FORMATS.
+            dither (bool): Add TPDF dither to integer formats.
+            seed (int): Seed for the dither noise, for reproducible files.
+        """
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unknown sample format: {sample_format}")
+        self.sample_rate = int(sample_rate)
+        self.sample_format = sample_format
+        self.format_tag, self.bits = SAMPLE_FORMATS[sample_format]
+        self.dither = dither and self.format_tag == WAVE_FORMAT_PCM
+        self.rng = np.random.default_rng(seed)
+        self.frames = 0
+        self.file = open(path, "wb")
+        self.write_header()
+
+    def write_header(self):
+        """Write (or rewrite) the RIFF header for the frames written so far."""
+        block_align = self.bits // 8
+        fmt = struct.pack("<HHIIHH", self.format_tag, 1, self.sample_rate,
+                          self.sample_rate * block_align, block_align, self.bits)
+        chunks = b""
+        if self.format_tag == WAVE_FORMAT_PCM:
+            chunks += b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        else:
+            # Non-PCM formats carry an extension size and a fact chunk
+            fmt += struct.pack("<H", 0)
+            chunks += b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            chunks += b"fact" + struct.pack("<II", 4, self.frames)
+
+        data_size = self.frames * block_align
+        riff_size = 4 + len(chunks) + 8 + data_size + (data_size & 1)
+        self.file.seek(0)
+        self.file.write(b"RIFF" + struct.pack("<I", riff_size) + b"WAVE" + chunks)
+        self.file.write(b"data" + struct.pack("<I", data_size))
+        self.data_offset = self.file.tell()
+
+    def encode(self, block):
+        """Convert a block of float samples in [-1, 1] to the file's sample bytes."""
+        if self.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            return np.asarray(block, dtype="<f4").tobytes()
+
+        full_scale = 2 ** (self.bits - 1)
+        samples = np.asarray(block, dtype=np.float64) * (full_scale - 1)
+        if self.dither:
+            samples += self.rng.random(len(samples)) - self.rng.random(len(samples))
+        samples = np.clip(np.rint(samples), -full_scale, full_scale - 1).astype("<i4")
+        if self.bits == 16:
+            return samples.astype("<i2").tobytes()
+        # 24-bit: the low three bytes of each little-endian int32
+        return samples.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+    def write(self, block):
+        """Append a block of samples."""
+        self.file.write(self.encode(block))
+        self.frames += len(block)
+
+    def close(self):
+        """Pad the data chunk to an even length and patch the header sizes."""
+        if self.file.closed:
+            return
+        if (self.frames * self.bits // 8) & 1:
+            self.file.write(b"\0")
+        self.write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_wav(preset_data, path, sample_rate=None, duration=None, sample_format="float32", dither=True, cache=None,
+               output_rate=None):
+    """
+    Render a preset to a WAV file without holding the whole render in memory.
+
+    Args:
+        preset_data (dict): Preset in the database/JSON format.
+        path (str): File to write.
+        sample_rate (int): Defaults to the preset's own rate, or DEFAULT_SAMPLE_RATE.
+        duration (float): Defaults to the preset's own duration.
+        sample_format (str): One of SAMPLE_FORMATS.
+        dither (bool): Add TPDF dither to integer formats.
+        cache (RenderCache): Stream a cached render from disk instead of
+            rendering, when there is one.
+        output_rate (int): Sample rate of the file, if it should differ from
+            the render's.
+
+    Returns:
+        tuple: (render_time, audio_length), both in seconds.
+    """
+    # Additive presets render at their own rate unless one is given
+    if sample_rate is None:
+        sample_rate = int(preset_data.get("sample_rate") or DEFAULT_SAMPLE_RATE)
+
+    start = time.perf_counter()
+    blocks = None
+    if cache is not None:
+        # A cache hit is memory-mapped, so slicing it only pages in each block
+        cached = cache.get(cache.key(preset_data, sample_rate, duration))
+        if cached is not None:
+            blocks = (cached[i:i + BLOCK_SIZE] for i in range(0, len(cached), BLOCK_SIZE))
+    if blocks is None:
+        blocks = render_blocks(preset_data, sample_rate, duration, BLOCK_SIZE)
+
+    if output_rate and int(output_rate) != sample_rate:
+        blocks = resample_blocks(blocks, sample_rate, output_rate)
+    else:
+        output_rate = sample_rate
+
+    with WavWriter(path, output_rate, sample_format, dither) as writer:
+        for block in blocks:
+            writer.write(block)
+    return time.perf_counter() - start, writer.frames / writer.sample_rate